@@ -0,0 +1,246 @@
+import argparse
+import ast
+import itertools
+import math
+import os
+import statistics
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from parametros import resolver_parametros
+
+# --- Barridos de parámetros y réplicas Monte Carlo ---
+# Cada configuración es un diccionario de cambios sobre parametros.py (como en
+# run_simulation) y se corre varias veces con semillas independientes en un
+# pool de procesos. Las series por frame se agregan a medida que llegan (media y
+# suma de cuadrados de las diferencias, con la actualización de Welford) y sólo hay
+# unas pocas corridas pendientes a la vez, así que la memoria no crece con las réplicas.
+
+
+def disenio_rejilla(espacio):
+    # Producto cartesiano: {"PESO_EVASION": [1, 2], "NUM_PELIGROS": [2, 4]} -> 4 configuraciones
+    nombres = list(espacio)
+    return [dict(zip(nombres, valores)) for valores in itertools.product(*espacio.values())]
+
+def disenio_aleatorio(espacio, muestras, semilla=None):
+    # Hipercubo latino: cada rango (min, max) se divide en `muestras` estratos y cada
+    # estrato se usa una vez. Si min y max son enteros se sortean enteros; una
+    # lista se trata como valores discretos a elegir.
+    rng = np.random.default_rng(semilla)
+    columnas = {}
+    for nombre, rango in espacio.items():
+        if isinstance(rango, list):
+            columnas[nombre] = [rango[i] for i in rng.integers(0, len(rango), muestras)]
+            continue
+        minimo, maximo = rango
+        u = (rng.permutation(muestras) + rng.uniform(size=muestras)) / muestras
+        if isinstance(minimo, int) and isinstance(maximo, int):
+            columnas[nombre] = [int(v) for v in np.floor(minimo + u * (maximo - minimo + 1)).clip(minimo, maximo)]
+        else:
+            columnas[nombre] = [float(v) for v in minimo + u * (maximo - minimo)]
+    return [{nombre: columnas[nombre][k] for nombre in espacio} for k in range(muestras)]
+
+
+def _distribucion_t(t, grados):
+    # P(T <= t) de la t de Student con grados enteros: suma finita en theta = atan(t / sqrt(g))
+    theta = math.atan(t / math.sqrt(grados))
+    seno, coseno2 = math.sin(theta), math.cos(theta) ** 2
+    if grados % 2:
+        suma, termino = 0.0, math.sqrt(coseno2)
+        for k in range(1, (grados - 1) // 2 + 1):
+            suma += termino
+            termino *= coseno2 * 2 * k / (2 * k + 1)
+        a = 2 / math.pi * (theta + seno * suma)
+    else:
+        suma, termino = 0.0, 1.0
+        for k in range(1, grados // 2 + 1):
+            suma += termino
+            termino *= coseno2 * (2 * k - 1) / (2 * k)
+        a = seno * suma
+    return 0.5 + a / 2
+
+def _cuantil_t(probabilidad, grados):
+    # Cuantil de la t de Student (sin scipy): la expansión de Cornish-Fisher como punto de
+    # partida y Newton sobre la distribución exacta, que con pocos grados de libertad
+    # (las réplicas de un barrido corto) se aleja bastante de la aproximación
+    z = statistics.NormalDist().inv_cdf(probabilidad)
+    g = int(grados) # Las cuentas de réplicas pueden llegar como float
+    t = (z + (z**3 + z) / (4 * g) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * g**2)
+         + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * g**3)
+         + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * g**4))
+    constante = math.exp(math.lgamma((g + 1) / 2) - math.lgamma(g / 2)) / math.sqrt(g * math.pi)
+    for _ in range(50):
+        densidad = constante * (1 + t * t / g) ** (-(g + 1) / 2)
+        paso = (_distribucion_t(t, g) - probabilidad) / densidad
+        t -= paso
+        if abs(paso) <= 1e-12 * max(1.0, abs(t)):
+            break
+    return t
+
+
+class _Acumulador:
+    # Por frame (ignorando NaN) de las series de una configuración: cantidad de valores,
+    # media y suma de los cuadrados de las diferencias con la media (Welford; no pierde
+    # precisión como la suma de cuadrados cuando la media es grande frente a la dispersión)
+    def __init__(self):
+        self.n = {}
+        self.media = {}
+        self.m2 = {}
+        self.replicas = 0
+
+    def agregar(self, estadisticas):
+        self.replicas += 1
+        for campo, serie in estadisticas.items():
+            serie = np.asarray(serie, dtype=float)
+            if campo not in self.media:
+                self.n[campo] = np.zeros(0)
+                self.media[campo] = np.zeros(0)
+                self.m2[campo] = np.zeros(0)
+            largo = max(len(serie), len(self.media[campo]))
+            for dic in (self.n, self.media, self.m2):
+                dic[campo] = np.pad(dic[campo], (0, largo - len(dic[campo])))
+            valida = ~np.isnan(serie)
+            n = self.n[campo][:len(serie)]
+            media = self.media[campo][:len(serie)]
+            n += valida
+            delta = np.where(valida, serie - media, 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                media += np.where(valida, delta / n, 0.0)
+            self.m2[campo][:len(serie)] += np.where(valida, delta * (serie - media), 0.0)
+
+    def resultado(self, confianza):
+        media, desviacion, ic_inferior, ic_superior = {}, {}, {}, {}
+        for campo in self.media:
+            n = self.n[campo]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                m = np.where(n > 0, self.media[campo], np.nan)
+                s = np.sqrt(self.m2[campo] / (n - 1))
+                cuantiles = {k: _cuantil_t(0.5 + confianza / 2, k - 1) if k > 1 else np.nan for k in np.unique(n)}
+                t = np.vectorize(cuantiles.get, otypes=[float])(n) if n.size else n
+                semiancho = t * s / np.sqrt(n)
+            media[campo], desviacion[campo] = m, s
+            ic_inferior[campo], ic_superior[campo] = m - semiancho, m + semiancho
+        return {"replicas": self.replicas, "media": media, "desviacion": desviacion,
+                "ic_inferior": ic_inferior, "ic_superior": ic_superior}
+
+
+def _correr_replica(indice, config):
+    from mi_simulacion_agent import run_simulation # Cada proceso importa la simulación una vez
+    return indice, run_simulation(config)
+
+def _rutas_por_corrida(config, k, replica):
+    # Cada corrida escribe en sus propios archivos: si la configuración pide instantáneas,
+    # trayectorias o estadísticas en disco, la ruta lleva la configuración y la réplica
+    config = dict(config)
+    sufijo = f"_c{k:03d}_r{replica:03d}"
+    for nombre in ("ARCHIVO_INSTANTANEA", "DIRECTORIO_TRAYECTORIA", "DIRECTORIO_ESTADISTICAS"):
+        if config.get(nombre):
+            raiz, extension = os.path.splitext(config[nombre]) if nombre == "ARCHIVO_INSTANTANEA" else (config[nombre], "")
+            config[nombre] = raiz + sufijo + extension
+    return config
+
+def ejecutar_barrido(configuraciones, replicas, base=None, procesos=None, semilla=None, confianza=0.95):
+    # Corre cada configuración `replicas` veces y devuelve, por configuración, la media,
+    # la desviación y el intervalo de confianza de cada serie por frame.
+    # `base` son cambios comunes a todas (p.ej. MOTOR o MAX_FRAMES_SIMULACION).
+    configuraciones = [dict(base or {}, **config) for config in configuraciones]
+    for config in configuraciones:
+        resolver_parametros(config) # Falla aquí (y no en los procesos) si hay un nombre mal escrito
+    semillas = np.random.default_rng(semilla).integers(0, 2**63, size=(len(configuraciones), replicas))
+    acumuladores = [_Acumulador() for _ in configuraciones]
+
+    corridas = ((k, _rutas_por_corrida(dict(config, SEMILLA=int(semillas[k, r])), k, r))
+                for k, config in enumerate(configuraciones) for r in range(replicas))
+    total = len(configuraciones) * replicas
+    procesos = procesos or os.cpu_count()
+    terminado = 0
+
+    def recoger(pendientes):
+        # Agrega las corridas que terminen y devuelve las que siguen pendientes (los
+        # resultados ya agregados se sueltan al volver)
+        nonlocal terminado
+        listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            indice, estadisticas = futuro.result()
+            acumuladores[indice].agregar(estadisticas)
+            terminado += 1
+            if terminado % max(1, total // 20) == 0 or terminado == total:
+                print(f"Barrido: {terminado}/{total} corridas")
+        return pendientes
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        # Como mucho dos corridas pendientes por proceso, así que no se juntan las series de todas
+        pendientes = set()
+        for indice, cambios in corridas:
+            pendientes.add(pool.submit(_correr_replica, indice, cambios))
+            if len(pendientes) >= 2 * procesos:
+                pendientes = recoger(pendientes)
+        while pendientes:
+            pendientes = recoger(pendientes)
+
+    return [dict(acumulador.resultado(confianza), config=config)
+            for config, acumulador in zip(configuraciones, acumuladores)]
+
+
+def guardar_barrido(resultados, ruta):
+    # Un .npz con arrays "<k>/<media|desviacion|ic_inferior|ic_superior>/<campo>" y la config en texto
+    arrays = {}
+    for k, resultado in enumerate(resultados):
+        arrays[f"{k}/config"] = np.array(repr(resultado["config"]))
+        arrays[f"{k}/replicas"] = np.array(resultado["replicas"])
+        for parte in ("media", "desviacion", "ic_inferior", "ic_superior"):
+            for campo, serie in resultado[parte].items():
+                arrays[f"{k}/{parte}/{campo}"] = serie
+    np.savez_compressed(ruta, **arrays)
+
+
+# --- Línea de Comandos ---
+def _literal(texto):
+    try:
+        return ast.literal_eval(texto)
+    except (ValueError, SyntaxError):
+        return texto # Se deja como texto (p.ej. MOTOR=objetos,vectorizado)
+
+def _leer_valores(texto):
+    # NOMBRE=v1,v2,v3 (valores para la rejilla) o NOMBRE=min:max (rango para el diseño aleatorio)
+    nombre, _, valores = texto.partition("=")
+    if ":" in valores:
+        minimo, maximo = (_literal(v) for v in valores.split(":"))
+        return nombre.strip(), (minimo, maximo)
+    return nombre.strip(), [_literal(v) for v in valores.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parámetros y réplicas Monte Carlo en paralelo.")
+    parser.add_argument("--param", action="append", default=[], type=_leer_valores, metavar="NOMBRE=VALORES",
+                        help="NOMBRE=v1,v2,... para la rejilla o NOMBRE=min:max para el diseño aleatorio")
+    parser.add_argument("--muestras", type=int,
+                        help="número de configuraciones del diseño aleatorio (hipercubo latino); sin esto, rejilla completa")
+    parser.add_argument("--replicas", type=int, default=10)
+    parser.add_argument("--procesos", type=int, help="procesos en paralelo (por defecto, todos los núcleos)")
+    parser.add_argument("--semilla", type=int, help="semilla del barrido (diseño y semillas de las réplicas)")
+    parser.add_argument("--motor", choices=("objetos", "vectorizado"))
+    parser.add_argument("--frames", type=int)
+    parser.add_argument("--salida", default="barrido.npz")
+    args = parser.parse_args(argv)
+
+    espacio = dict(args.param)
+    if args.muestras:
+        configuraciones = disenio_aleatorio(espacio, args.muestras, args.semilla)
+    else:
+        configuraciones = disenio_rejilla({nombre: v if isinstance(v, list) else list(v) for nombre, v in espacio.items()})
+    base = {}
+    if args.motor: base["MOTOR"] = args.motor
+    if args.frames is not None: base["MAX_FRAMES_SIMULACION"] = args.frames
+
+    resultados = ejecutar_barrido(configuraciones, args.replicas, base, args.procesos, args.semilla)
+    for resultado in resultados:
+        consumidos = resultado["media"]["recursos_consumidos_total"]
+        final = consumidos[-1] if len(consumidos) else math.nan
+        print(f"{resultado['config']}: consumidos al final = {final:.1f}")
+    guardar_barrido(resultados, args.salida)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from camara import Camara
+from parametros import ALTO_PANTALLA, ANCHO_PANTALLA, GRIS_CLARO, NUM_CRIATURAS_INICIALES, NUM_PELIGROS, NUM_RECURSOS_INICIALES
+from perfil import CONTADORES, FASES, Perfil
+
+# --- Benchmark del bucle de frames ---
+# Cada escenario es una simulación sin ventana con cierta cantidad de criaturas,
+# recursos y peligros. Se mide cada frame con un Perfil (tiempo por fase) y se
+# reportan FPS y percentiles de latencia en un JSON, para comparar entre commits
+# con --comparar. El dibujo se hace sobre una superficie fuera de pantalla del
+# tamaño de la ventana (con la cámara en la esquina del mundo, que puede ser más
+# grande), así que no hace falta un display.
+
+CRIATURAS = (30, 100, 300, 1000, 3000, 10_000, 30_000, 100_000)
+RECURSOS = (20, 100, 1000, 10_000)
+PELIGROS = (2, 10, 50)
+PERCENTILES = (50, 90, 99)
+
+
+def tamanio_mundo(criaturas, area_por_criatura):
+    # El mundo crece con la población para que la densidad no pase de 1 criatura
+    # cada `area_por_criatura` px² (si no, los pares de vecinos crecen como n²)
+    factor = max(1.0, math.sqrt(criaturas * area_por_criatura / (ANCHO_PANTALLA * ALTO_PANTALLA)))
+    return round(ANCHO_PANTALLA * factor), round(ALTO_PANTALLA * factor)
+
+def escenarios(motores, criaturas=None, recursos=None, peligros=None, area_por_criatura=240.0, max_objetos=3000):
+    # Sin listas explícitas: tres barridos (criaturas, recursos y peligros) variando uno
+    # y dejando los otros en los valores de parametros.py. Con listas: su producto.
+    if criaturas is None and recursos is None and peligros is None:
+        combinaciones = ([(c, NUM_RECURSOS_INICIALES, NUM_PELIGROS) for c in CRIATURAS]
+                         + [(300, r, NUM_PELIGROS) for r in RECURSOS]
+                         + [(300, NUM_RECURSOS_INICIALES, p) for p in PELIGROS])
+    else:
+        combinaciones = [(c, r, p) for c in criaturas or (NUM_CRIATURAS_INICIALES,)
+                         for r in recursos or (NUM_RECURSOS_INICIALES,)
+                         for p in peligros or (NUM_PELIGROS,)]
+    lista = []
+    for motor in motores:
+        for c, r, p in dict.fromkeys(combinaciones):
+            if motor == "objetos" and c > max_objetos:
+                continue # El bucle de sprites tardaría minutos por frame
+            ancho, alto = tamanio_mundo(c, area_por_criatura)
+            lista.append({"nombre": f"{motor}/c={c}/r={r}/p={p}",
+                          "config": {"MOTOR": motor, "NUM_CRIATURAS_INICIALES": c, "NUM_RECURSOS_INICIALES": r,
+                                     "NUM_PELIGROS": p, "ANCHO_PANTALLA": ancho, "ALTO_PANTALLA": alto}})
+    return lista
+
+
+def escenarios_escalado(criaturas, procesos, area_por_criatura=240.0):
+    # El motor vectorizado como referencia y el paralelo con cada cantidad de procesos
+    # (una tesela por proceso), con la misma población y los mismos recursos y peligros
+    ancho, alto = tamanio_mundo(criaturas, area_por_criatura)
+    mundo = {"NUM_CRIATURAS_INICIALES": criaturas, "ANCHO_PANTALLA": ancho, "ALTO_PANTALLA": alto}
+    lista = [{"nombre": f"vectorizado/c={criaturas}", "config": dict(mundo, MOTOR="vectorizado")}]
+    for n in procesos:
+        lista.append({"nombre": f"paralelo/c={criaturas}/procesos={n}",
+                      "config": dict(mundo, MOTOR="paralelo", PROCESOS=n, TESELAS=n)})
+    return lista
+
+def _resumen(valores):
+    # Segundos -> milisegundos
+    valores = np.asarray(valores) * 1000.0
+    resumen = {"media": float(valores.mean()), "max": float(valores.max())}
+    resumen.update({f"p{q}": float(np.percentile(valores, q)) for q in PERCENTILES})
+    return resumen
+
+def medir(config, frames=30, calentamiento=5, dibujar=True, tiempo_max=20.0, semilla=0):
+    import pygame
+    from mi_simulacion_agent import Simulacion
+
+    inicio = time.perf_counter()
+    sim = Simulacion(dict(config, SEMILLA=semilla, MAX_FRAMES_SIMULACION=calentamiento + frames))
+    creacion = time.perf_counter() - inicio
+    # Como la ventana: una vista de ANCHO_VENTANA x ALTO_VENTANA sobre el mundo, que sólo dibuja lo que se ve
+    ancho_mundo, alto_mundo = sim.p["ANCHO_PANTALLA"], sim.p["ALTO_PANTALLA"]
+    vista = min(sim.p["ANCHO_VENTANA"], ancho_mundo), min(sim.p["ALTO_VENTANA"], alto_mundo)
+    camara = Camara(*vista, ancho_mundo, alto_mundo)
+    superficie = pygame.Surface(vista) if dibujar else None
+
+    def frame():
+        sim.perfil.iniciar_frame()
+        if sim.paso() is None:
+            return False
+        if superficie is not None:
+            superficie.fill(GRIS_CLARO)
+            sim.dibujar(superficie, camara)
+            sim.perfil.marcar("dibujo")
+        sim.perfil.terminar_frame()
+        return True
+
+    limite = time.perf_counter() + tiempo_max
+    for _ in range(calentamiento):
+        if time.perf_counter() > limite or not frame():
+            break
+    sim.perfil = Perfil()
+    limite = time.perf_counter() + tiempo_max
+    # Al menos 3 frames medidos aunque se pase del tiempo, para que haya percentiles
+    while len(sim.perfil.registro) < frames and (len(sim.perfil.registro) < 3 or time.perf_counter() < limite):
+        if not frame():
+            break
+
+    tiempos = sim.perfil.tiempos()
+    if not len(tiempos["total"]):
+        return {"frames": 0, "creacion_s": creacion}
+    fases = {fase: _resumen(tiempos[fase]) for fase in FASES}
+    medido = sum(tiempos[fase] for fase in FASES)
+    return {
+        "frames": len(tiempos["total"]),
+        "creacion_s": creacion,
+        "fps": float(1.0 / tiempos["total"].mean()),
+        "latencia_ms": _resumen(tiempos["total"]),
+        "fases_ms": fases,
+        "sin_medir_ms": float((tiempos["total"] - medido).mean() * 1000.0),
+        "contadores": {nombre: float(tiempos[nombre].mean()) for nombre in CONTADORES},
+    }
+
+
+def _metadatos():
+    import pygame
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+    }
+
+def ejecutar_benchmark(lista, **opciones):
+    resultados = []
+    for escenario in lista:
+        resultado = dict(escenario, **medir(escenario["config"], **opciones))
+        resultados.append(resultado)
+        if resultado["frames"]:
+            fases = " ".join(f"{fase}={resultado['fases_ms'][fase]['media']:.2f}" for fase in FASES
+                             if resultado["fases_ms"][fase]["max"] > 0)
+            print(f"{escenario['nombre']}: {resultado['fps']:.1f} FPS, p50={resultado['latencia_ms']['p50']:.2f} ms, "
+                  f"p99={resultado['latencia_ms']['p99']:.2f} ms | {fases}")
+        else:
+            print(f"{escenario['nombre']}: sin frames medidos")
+    return {"meta": dict(_metadatos(), opciones=opciones), "escenarios": resultados}
+
+
+def escalado(resultados, medida="p50"):
+    # Aceleración de cada escenario respecto del primero (el motor vectorizado)
+    base, *resto = [e for e in resultados["escenarios"] if e["frames"]] or [None]
+    for escenario in resto:
+        antes, ahora = base["latencia_ms"][medida], escenario["latencia_ms"][medida]
+        print(f"{escenario['nombre']}: {medida} {ahora:.2f} ms, x{antes / ahora:.2f} respecto de {base['nombre']}")
+
+
+def comparar(base, nuevo, tolerancia=0.10, medida="p50"):
+    # Escenarios presentes en los dos archivos; regresión = latencia `medida` más de `tolerancia` peor
+    anteriores = {e["nombre"]: e for e in base["escenarios"] if e["frames"]}
+    regresiones = []
+    for escenario in nuevo["escenarios"]:
+        anterior = anteriores.get(escenario["nombre"])
+        if anterior is None or not escenario["frames"]:
+            continue
+        antes, ahora = anterior["latencia_ms"][medida], escenario["latencia_ms"][medida]
+        cambio = ahora / antes - 1.0
+        marca = " <-- REGRESIÓN" if cambio > tolerancia else ""
+        print(f"{escenario['nombre']}: {medida} {antes:.2f} -> {ahora:.2f} ms ({cambio:+.1%}){marca}")
+        if marca:
+            regresiones.append(escenario["nombre"])
+    return regresiones
+
+
+# --- Línea de Comandos ---
+def _enteros(texto):
+    return [int(v) for v in texto.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del bucle de frames: FPS y latencia por fase.")
+    parser.add_argument("--motor", action="append", choices=("objetos", "vectorizado", "paralelo"),
+                        help="motor a medir; se puede repetir (por defecto, objetos y vectorizado)")
+    parser.add_argument("--criaturas", type=_enteros, metavar="N1,N2,...")
+    parser.add_argument("--recursos", type=_enteros, metavar="N1,N2,...")
+    parser.add_argument("--peligros", type=_enteros, metavar="N1,N2,...")
+    parser.add_argument("--frames", type=int, default=30, help="frames medidos por escenario")
+    parser.add_argument("--calentamiento", type=int, default=5, help="frames descartados al inicio")
+    parser.add_argument("--tiempo-max", type=float, default=20.0, help="segundos de medición por escenario como máximo")
+    parser.add_argument("--sin-dibujo", action="store_true", help="no mide la fase de dibujo")
+    parser.add_argument("--area-por-criatura", type=float, default=240.0,
+                        help="px² de mundo por criatura; el mundo se agranda para respetarlo")
+    parser.add_argument("--max-objetos", type=int, default=3000,
+                        help="no corre el motor de objetos con más criaturas que esto")
+    parser.add_argument("--escalado", type=_enteros, metavar="P1,P2,...",
+                        help="mide el motor paralelo con estas cantidades de procesos contra el vectorizado, "
+                             "con la primera cantidad de --criaturas (por defecto 100000)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="compara dos resultados guardados en vez de medir; sale con código 1 si hay regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="empeoramiento relativo tolerado al comparar")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        with open(args.comparar[0]) as f_base, open(args.comparar[1]) as f_nuevo:
+            regresiones = comparar(json.load(f_base), json.load(f_nuevo), args.tolerancia)
+        print(f"{len(regresiones)} regresiones")
+        sys.exit(1 if regresiones else 0)
+
+    if args.escalado:
+        lista = escenarios_escalado((args.criaturas or [100_000])[0], args.escalado, args.area_por_criatura)
+    else:
+        lista = escenarios(args.motor or ("objetos", "vectorizado"), args.criaturas, args.recursos, args.peligros,
+                           args.area_por_criatura, args.max_objetos)
+    resultados = ejecutar_benchmark(lista, frames=args.frames, calentamiento=args.calentamiento,
+                                    dibujar=not args.sin_dibujo, tiempo_max=args.tiempo_max, semilla=args.semilla)
+    if args.escalado:
+        escalado(resultados)
+    with open(args.salida, "w") as archivo:
+        json.dump(resultados, archivo, indent=1)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+
+# --- Cámara ---
+# El mundo (ANCHO_PANTALLA x ALTO_PANTALLA) puede ser mucho más grande que la ventana.
+# La cámara es la parte del mundo que se ve: su esquina superior izquierda (x, y) en
+# coordenadas del mundo y el zoom (píxeles de pantalla por unidad del mundo). Con
+# zoom 1 y la cámara en (0, 0) las entidades se dibujan donde se dibujaban sin cámara.
+
+
+class Camara:
+    def __init__(self, ancho_vista, alto_vista, ancho_mundo, alto_mundo, zoom_max=8.0):
+        self.ancho_vista = ancho_vista
+        self.alto_vista = alto_vista
+        self.ancho_mundo = ancho_mundo
+        self.alto_mundo = alto_mundo
+        # Con el zoom mínimo entra el mundo entero en la ventana
+        self.zoom_min = min(1.0, ancho_vista / ancho_mundo, alto_vista / alto_mundo)
+        self.zoom_max = zoom_max
+        self.zoom = 1.0
+        self.x = 0.0
+        self.y = 0.0
+
+    def mover(self, dx, dy):
+        # dx, dy en píxeles de pantalla
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._limitar()
+
+    def acercar(self, factor, foco=None):
+        # Cambia el zoom dejando quieto el punto del mundo que está bajo `foco` (en pantalla)
+        fx, fy = foco if foco is not None else (self.ancho_vista / 2, self.alto_vista / 2)
+        mx, my = self.a_mundo(fx, fy)
+        self.zoom = min(max(self.zoom * factor, self.zoom_min), self.zoom_max)
+        self.x = mx - fx / self.zoom
+        self.y = my - fy / self.zoom
+        self._limitar()
+
+    def ver_todo(self):
+        self.zoom = self.zoom_min
+        self._limitar()
+
+    def _limitar(self):
+        # No se sale del mundo; si el mundo entra entero en un eje, queda centrado en ese eje
+        ancho, alto = self.ancho_vista / self.zoom, self.alto_vista / self.zoom
+        self.x = (self.ancho_mundo - ancho) / 2 if ancho >= self.ancho_mundo else min(max(self.x, 0.0), self.ancho_mundo - ancho)
+        self.y = (self.alto_mundo - alto) / 2 if alto >= self.alto_mundo else min(max(self.y, 0.0), self.alto_mundo - alto)
+
+    def visible(self, margen=0):
+        # (x0, y0, x1, y1) del mundo que se ve, agrandado en `margen` unidades del mundo
+        return (self.x - margen, self.y - margen,
+                self.x + self.ancho_vista / self.zoom + margen, self.y + self.alto_vista / self.zoom + margen)
+
+    def en_vista(self, posiciones, margen=0):
+        # Máscara de las posiciones (n, 2) dentro de visible(margen): una sola pasada por
+        # los arrays, sin ordenar (para posiciones que cambian en cada frame)
+        x0, y0, x1, y1 = self.visible(margen)
+        x, y = posiciones[:, 0], posiciones[:, 1]
+        return (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+
+    def a_pantalla(self, posiciones):
+        # Posiciones del mundo (n, 2) a píxeles enteros de la ventana
+        return ((np.asarray(posiciones, dtype=float).reshape(-1, 2) - (self.x, self.y)) * self.zoom).astype(int)
+
+    def a_mundo(self, px, py):
+        return self.x + px / self.zoom, self.y + py / self.zoom
+
+    def radio(self, radio):
+        # Radio en pantalla de una entidad (al menos un píxel)
+        return max(1, round(radio * self.zoom))
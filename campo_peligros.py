@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+
+
+class CampoPeligros:
+    # Los peligros no se mueven, así que lo que depende sólo de ellos se calcula una
+    # vez sobre una rejilla que cubre el mundo (más un margen para las criaturas que
+    # salen un poco antes de dar la vuelta):
+    #   - para cada celda, los peligros que pueden estar a la vista desde algún punto
+    #     de la celda o ser el más cercano a alguno. Medir desde una posición sólo
+    #     recorre los candidatos de su celda, y el resultado es exactamente el mismo
+    #     que recorriendo todos los peligros (la evasión limita la fuerza de cada
+    #     peligro por separado según la velocidad, así que no se puede guardar ya
+    #     sumada en un campo de vectores).
+    #   - para cada celda, los peligros con algún punto de la celda a menos de
+    #     `radio_prohibido` (donde no se ponen recursos): un punto sólo se mide contra
+    #     esos, con la misma distancia que Vector2.distance_to.
+    # Con los peligros repartidos, el costo por consulta no depende de cuántos haya.
+    def __init__(self, posiciones, ancho, alto, radio_vision, radio_prohibido, tam_celda=20, margen=0, objetos=None):
+        self.posiciones = np.asarray(posiciones, dtype=float).reshape(-1, 2)
+        self.tam_celda = tam_celda
+        self.origen = -margen
+        self.columnas = max(1, math.ceil((ancho + 2 * margen) / tam_celda))
+        self.filas = max(1, math.ceil((alto + 2 * margen) / tam_celda))
+        self.inicio, self.ids = self._candidatos(radio_vision)
+        self.radio_prohibido = radio_prohibido
+        self.inicio_prohibido, self.ids_prohibido = self._cerca_de_celdas(radio_prohibido)
+        # Con los objetos (sprites) de cada peligro, también las tuplas por celda para Criatura
+        self.por_celda = None
+        if objetos is not None:
+            ids = self.ids.tolist()
+            self.por_celda = [tuple(objetos[k] for k in ids[a:b])
+                              for a, b in zip(self.inicio[:-1].tolist(), self.inicio[1:].tolist())]
+
+    def _extremos(self, c, px, py):
+        # Distancia de cada peligro al punto más cercano y al más lejano de cada celda
+        x0 = self.origen + (c % self.columnas) * self.tam_celda
+        y0 = self.origen + (c // self.columnas) * self.tam_celda
+        dx = np.maximum(0.0, np.maximum(x0 - px, px - (x0 + self.tam_celda)))
+        dy = np.maximum(0.0, np.maximum(y0 - py, py - (y0 + self.tam_celda)))
+        lx = np.maximum(np.abs(px - x0), np.abs(px - (x0 + self.tam_celda)))
+        ly = np.maximum(np.abs(py - y0), np.abs(py - (y0 + self.tam_celda)))
+        return np.sqrt(dx * dx + dy * dy), np.sqrt(lx * lx + ly * ly)
+
+    def _disco(self, px, py, radio):
+        # Celdas del cuadrado que encierra el disco de `radio` alrededor de (px, py)
+        cx = np.arange(max(0, math.floor((px - radio - self.origen) / self.tam_celda)),
+                       min(self.columnas, math.floor((px + radio - self.origen) / self.tam_celda) + 1))
+        cy = np.arange(max(0, math.floor((py - radio - self.origen) / self.tam_celda)),
+                       min(self.filas, math.floor((py + radio - self.origen) / self.tam_celda) + 1))
+        return (cy[:, None] * self.columnas + cx[None, :]).ravel()
+
+    def _csr(self, c, k):
+        # Pares (celda, peligro) sin repetir -> inicio por celda e ids en orden de celda y de peligro
+        celdas = self.columnas * self.filas
+        clave = np.sort(c * max(1, len(self.posiciones)) + k)
+        c, k = np.divmod(clave, max(1, len(self.posiciones)))
+        inicio = np.zeros(celdas + 1, dtype=np.intp)
+        inicio[1:] = np.cumsum(np.bincount(c, minlength=celdas))
+        return inicio, k.astype(np.intp)
+
+    def _candidatos(self, radio_vision, lado=32, bloque=1 << 16):
+        # Por celda (en orden de celda y de peligro): los peligros con algún punto de la
+        # celda a menos de radio_vision y los que pueden ser el más cercano, es decir, los
+        # que están a lo sumo a la distancia del peligro más lejano desde el peor punto
+        holgura = 1e-9 * self.tam_celda # Que el redondeo no deje afuera a un empate
+        celdas = self.columnas * self.filas
+        lista_c, lista_k = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+        # A la vista: cada peligro sólo revisa las celdas que toca su disco. Una celda que
+        # algún peligro ve entera ya tiene al más cercano entre los que están a la vista.
+        cubierta = np.zeros(celdas, dtype=bool)
+        for k, (px, py) in enumerate(self.posiciones.tolist()):
+            c = self._disco(px, py, radio_vision + holgura)
+            minima, maxima = self._extremos(c, px, py)
+            lista_c.append(c[minima < radio_vision + holgura])
+            lista_k.append(np.full(lista_c[-1].size, k))
+            cubierta[c[maxima + holgura < radio_vision + holgura]] = True
+
+        # El más cercano en las demás celdas, por bloques de lado x lado celdas: el peligro
+        # más lejano desde el peor punto del bloque acota a los de todas sus celdas
+        libres = np.flatnonzero(~cubierta)
+        if libres.size and len(self.posiciones):
+            px, py = self.posiciones[:, 0], self.posiciones[:, 1]
+            columnas_b = math.ceil(self.columnas / lado)
+            bloques, bloque_de = np.unique((libres // self.columnas) // lado * columnas_b
+                                           + (libres % self.columnas) // lado, return_inverse=True)
+            lado_b = lado * self.tam_celda
+            x0 = (self.origen + (bloques % columnas_b) * lado_b)[:, None]
+            y0 = (self.origen + (bloques // columnas_b) * lado_b)[:, None]
+            dx = np.maximum(0.0, np.maximum(x0 - px, px - (x0 + lado_b)))
+            dy = np.maximum(0.0, np.maximum(y0 - py, py - (y0 + lado_b)))
+            lx = np.maximum(np.abs(px - x0), np.abs(px - (x0 + lado_b)))
+            ly = np.maximum(np.abs(py - y0), np.abs(py - (y0 + lado_b)))
+            cota = np.sqrt(lx * lx + ly * ly).min(axis=1)
+            # Margen de sobra: esto sólo descarta, la comparación exacta es por celda
+            b, k_b = np.nonzero(np.sqrt(dx * dx + dy * dy) <= cota[:, None] * (1 + 1e-6) + holgura)
+            cuenta_b = np.bincount(b, minlength=len(bloques))
+            inicio_b = np.cumsum(cuenta_b) - cuenta_b
+            for primera in range(0, libres.size, bloque):
+                c = libres[primera:primera + bloque]
+                cuenta = cuenta_b[bloque_de[primera:primera + bloque]]
+                fila = np.repeat(np.arange(c.size), cuenta)
+                desplazamiento = np.arange(fila.size) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+                k = k_b[np.repeat(inicio_b[bloque_de[primera:primera + bloque]], cuenta) + desplazamiento]
+                minima, maxima = self._extremos(c[fila], px[k], py[k])
+                # Cada celda tiene al menos un par (el peligro que da la cota de su bloque)
+                mas_lejano = np.minimum.reduceat(maxima, np.cumsum(cuenta) - cuenta)
+                # Los que están a la vista ya se agregaron
+                cerca = (minima <= mas_lejano[fila] + holgura) & ~(minima < radio_vision + holgura)
+                lista_c.append(c[fila[cerca]])
+                lista_k.append(k[cerca])
+        return self._csr(np.concatenate(lista_c), np.concatenate(lista_k))
+
+    def _cerca_de_celdas(self, radio):
+        # Por celda (en orden de celda y de peligro): los peligros con algún punto de la
+        # celda a menos de `radio`. Cada peligro sólo revisa las celdas que toca su disco
+        holgura = 1e-9 * self.tam_celda
+        lista_c, lista_k = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+        for k, (px, py) in enumerate(self.posiciones.tolist()):
+            c = self._disco(px, py, radio)
+            minima, _ = self._extremos(c, px, py)
+            lista_c.append(c[minima < radio + holgura])
+            lista_k.append(np.full(lista_c[-1].size, k))
+        return self._csr(np.concatenate(lista_c), np.concatenate(lista_k))
+
+    def _celda(self, x, y):
+        cx = min(max(int((x - self.origen) // self.tam_celda), 0), self.columnas - 1)
+        cy = min(max(int((y - self.origen) // self.tam_celda), 0), self.filas - 1)
+        return cy * self.columnas + cx
+
+    def peligros_en(self, posicion):
+        # Los peligros (objetos) que hay que medir desde una posición, en el orden original
+        return self.por_celda[self._celda(posicion.x, posicion.y)]
+
+    def candidatos(self, puntos):
+        # Pares (i, k): para cada punto, sus peligros candidatos, ordenados por punto y por peligro
+        return self._pares(puntos, self.inicio, self.ids)
+
+    def _pares(self, puntos, inicio, ids):
+        c = np.floor((puntos - self.origen) / self.tam_celda).astype(np.intp)
+        c = np.clip(c[:, 1], 0, self.filas - 1) * self.columnas + np.clip(c[:, 0], 0, self.columnas - 1)
+        cuenta = inicio[c + 1] - inicio[c]
+        total = cuenta.sum()
+        desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        return np.repeat(np.arange(len(puntos)), cuenta), ids[np.repeat(inicio[c], cuenta) + desplazamiento]
+
+    def es_prohibido(self, x, y):
+        # x, y enteros (o arrays de enteros) dentro del mundo: si están a menos de
+        # radio_prohibido de algún peligro
+        if np.ndim(x) == 0:
+            c = self._celda(x, y)
+            for px, py in self.posiciones[self.ids_prohibido[self.inicio_prohibido[c]:self.inicio_prohibido[c + 1]]].tolist():
+                dx, dy = x - px, y - py
+                if math.sqrt(dx * dx + dy * dy) < self.radio_prohibido:
+                    return True
+            return False
+        puntos = np.column_stack([x, y]).astype(float)
+        i, k = self._pares(puntos, self.inicio_prohibido, self.ids_prohibido)
+        d = puntos[i] - self.posiciones[k]
+        cerca = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1]) < self.radio_prohibido
+        return np.bincount(i[cerca], minlength=len(puntos)) > 0
@@ -0,0 +1,111 @@
+import argparse
+import io
+import random
+import sys
+
+import numpy as np
+
+from parametros import ESTADO_EXPLORANDO, ESTADOS
+
+# --- Comparación del motor vectorizado con Criatura ---
+# Desde un mismo estado (criaturas, peligros y recursos disponibles), una llamada a
+# MotorVectorizado.actualizar_comportamiento contra Criatura.actualizar_comportamiento
+# de cada sprite, sin mover a nadie: los estados deben ser iguales y las velocidades
+# iguales salvo por el orden de las sumas (~1e-15). La exploración usa números al azar;
+# a cada sprite se le dan los mismos que sorteó el motor para esa fila.
+# El estado sale de unos frames del motor vectorizado, para que haya criaturas
+# evadiendo, buscando y explorando con vecinos.
+
+
+class _Sorteos:
+    # Generador para un sprite: devuelve en orden los números ya sorteados por el motor
+    def __init__(self, valores):
+        self.valores = list(valores)
+
+    def uniform(self, a, b):
+        if not self.valores:
+            raise RuntimeError("La criatura sorteó más números que su fila del motor")
+        return self.valores.pop(0)
+
+
+def mundos(config, frames):
+    # (Simulacion vectorizada después de `frames` frames, Simulacion de objetos con el mismo estado)
+    from mi_simulacion_agent import Simulacion
+    vectorizada = Simulacion(dict(config, MOTOR="vectorizado"))
+    for _ in range(frames):
+        vectorizada.paso()
+    motor = vectorizada.motor
+    datos = {
+        "contadores": np.array([vectorizada.frame_actual, vectorizada.total_recursos_consumidos]),
+        "criaturas_pos": motor.pos, "criaturas_vel": motor.vel, "criaturas_estado": motor.estado,
+        "peligros_pos": motor.peligros_pos,
+        "recursos_pos": motor.recursos_pos[motor.recursos_disponible],
+        "recursos_disponible": np.ones(int(motor.recursos_disponible.sum()), dtype=bool),
+        "rng": np.array(repr(random.Random(0).getstate())),
+    }
+    datos.update({f"registro/{nombre}": valor for nombre, valor in vectorizada.registro.instantanea().items()})
+    archivo = io.BytesIO() # Como una instantánea de guardar_instantanea, pero en memoria
+    np.savez(archivo, **datos)
+    archivo.seek(0)
+    with np.load(archivo) as instantanea:
+        objetos = Simulacion(dict(vectorizada.p, MOTOR="objetos"), instantanea=instantanea)
+    return vectorizada, objetos
+
+def comparar(config, frames=30):
+    vectorizada, objetos = mundos(config, frames)
+    motor = vectorizada.motor
+    velocidad_previa = motor.vel.copy()
+    estado_rng = motor.rng.bit_generator.state
+    motor.actualizar_comportamiento()
+
+    # Los mismos sorteos que hizo MotorVectorizado.explorar, repartidos por criatura
+    rng = np.random.default_rng()
+    rng.bit_generator.state = estado_rng
+    explorando = np.flatnonzero(motor.estado == ESTADO_EXPLORANDO)
+    quietas = ~velocidad_previa[explorando].any(axis=1)
+    circulos = iter(rng.uniform(-1, 1, (quietas.sum(), 2)).tolist())
+    desplazamientos = rng.uniform(-1, 1, (len(explorando), 2)).tolist()
+    sorteos = {}
+    for fila, i in enumerate(explorando.tolist()):
+        sorteos[i] = (next(circulos) if quietas[fila] else []) + desplazamientos[fila]
+
+    criaturas = list(objetos.criaturas_grupo)
+    with objetos._constantes():
+        objetos.rejilla_criaturas.reconstruir(criaturas)
+        peligros = list(objetos.peligros_grupo)
+        for i, criatura in enumerate(criaturas):
+            criatura.rng = _Sorteos(sorteos.get(i, ()))
+            criatura.actualizar_comportamiento(objetos.recursos_grupo, peligros, criaturas, objetos.rejilla_criaturas,
+                                               objetos.recursos_grupo.rejilla, objetos.campo_peligros)
+    estados = np.array([c.estado_actual for c in criaturas], dtype=np.int8)
+    velocidades = np.array([tuple(c.velocidad) for c in criaturas], dtype=float).reshape(-1, 2)
+    iguales = estados == motor.estado
+    return {
+        "criaturas": len(criaturas),
+        "por_estado": np.bincount(motor.estado, minlength=len(ESTADOS)).tolist(),
+        "estados_distintos": int((~iguales).sum()),
+        "max_diferencia_vel": float(np.abs(velocidades - motor.vel)[iguales].max(initial=0.0)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara MotorVectorizado con Criatura desde un mismo estado.")
+    parser.add_argument("--criaturas", type=int, default=400)
+    parser.add_argument("--frames", type=int, default=30, help="frames del motor vectorizado antes de comparar")
+    parser.add_argument("--semillas", type=int, default=5, help="se compara con las semillas 0..N-1")
+    parser.add_argument("--tolerancia", type=float, default=1e-12, help="diferencia máxima de velocidad aceptada")
+    args = parser.parse_args(argv)
+
+    fallas = 0
+    for semilla in range(args.semillas):
+        resultado = comparar({"SEMILLA": semilla, "NUM_CRIATURAS_INICIALES": args.criaturas}, args.frames)
+        bien = not resultado["estados_distintos"] and resultado["max_diferencia_vel"] <= args.tolerancia
+        fallas += not bien
+        conteo = ", ".join(f"{nombre.lower()}={k}" for nombre, k in zip(ESTADOS, resultado["por_estado"]))
+        print(f"Semilla {semilla}: {conteo}; estados distintos: {resultado['estados_distintos']}, "
+              f"máx. |Δvel| = {resultado['max_diferencia_vel']:.2e} {'OK' if bien else 'DIFERENTE'}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import pygame
+
+from parametros import NEGRO
+
+# --- Dibujo por lotes ---
+# Todas las entidades de un tipo comparten una superficie (un círculo del color y
+# radio del tipo) y se dibujan con un solo Surface.blits. La ventana sólo vuelve a
+# enviar al display los rectángulos que cambiaron desde el frame anterior.
+
+_superficies = {}
+
+def superficie_circulo(color, radio):
+    # Una superficie por (color, radio), creada la primera vez que se pide
+    clave = (tuple(color), radio)
+    superficie = _superficies.get(clave)
+    if superficie is None:
+        # Sin canal alfa: el fondo es un color clave distinto del círculo (con RLE se
+        # copia bastante más rápido que una superficie SRCALPHA)
+        clave_color = NEGRO if tuple(color) != NEGRO else (255, 0, 255)
+        superficie = pygame.Surface([radio * 2, radio * 2])
+        superficie.fill(clave_color)
+        pygame.draw.circle(superficie, color, (radio, radio), radio)
+        superficie.set_colorkey(clave_color, pygame.RLEACCEL)
+        _superficies[clave] = superficie
+    return superficie
+
+def dibujar_capas(pantalla, capas):
+    # capas: (color, radio, esquinas) en orden de dibujo; esquinas son las (x, y)
+    # superiores izquierdas de cada entidad. Devuelve los rectángulos dibujados.
+    rects = []
+    for color, radio, esquinas in capas:
+        superficie = superficie_circulo(color, radio)
+        rects += pantalla.blits([(superficie, esquina) for esquina in esquinas])
+    return rects
+
+
+class CacheTextos:
+    # Superficies de texto ya renderizadas; sólo se vuelve a rasterizar un texto
+    # cuando cambia su contenido. Se vacía entera al llenarse (los textos viejos,
+    # como contadores que ya pasaron, no vuelven).
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self._textos = {}
+
+    def render(self, fuente, texto, color):
+        clave = (id(fuente), texto, color)
+        superficie = self._textos.get(clave)
+        if superficie is None:
+            if len(self._textos) >= self.capacidad:
+                self._textos.clear()
+            superficie = self._textos[clave] = fuente.render(texto, True, color)
+        return superficie
+
+
+class Renderizador:
+    # Dibujo de la ventana con rectángulos sucios: en vez de pintar todo el fondo,
+    # borra sólo lo que se dibujó en el frame anterior y devuelve la lista de
+    # rectángulos a actualizar (lo borrado más lo nuevo). Con demasiados
+    # rectángulos sale más barato repintar y enviar la pantalla entera, y en ese
+    # caso devuelve None (hay que usar pygame.display.flip).
+    def __init__(self, fondo, max_rects=2000):
+        self.fondo = fondo
+        self.max_rects = max_rects
+        self.textos = CacheTextos()
+        self._anteriores = None # None: el próximo frame se pinta entero
+
+    def texto(self, fuente, texto, color):
+        return self.textos.render(fuente, texto, color)
+
+    def dibujar(self, pantalla, capas, textos=()):
+        # textos: (superficie, posición) que se dibujan encima de las entidades
+        anteriores = self._anteriores
+        if anteriores is None:
+            pantalla.fill(self.fondo)
+        else:
+            for rect in anteriores:
+                pantalla.fill(self.fondo, rect)
+        rects = dibujar_capas(pantalla, capas)
+        rects += pantalla.blits(list(textos))
+        self._anteriores = rects if len(rects) <= self.max_rects else None
+        if anteriores is None or self._anteriores is None:
+            return None
+        return anteriores + rects
+
+    def invalidar(self):
+        # Fuerza un repintado completo en el próximo frame (p.ej. tras cambiar de tamaño)
+        self._anteriores = None
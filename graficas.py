@@ -0,0 +1,169 @@
+import numpy as np
+
+from parametros import COLOR_EXPLORANDO_MPL, COLOR_PELIGRO_MPL, COLOR_RECURSO_MPL
+
+# --- Reducción de series para graficar ---
+# Una corrida larga tiene millones de frames y una gráfica no muestra más puntos que
+# píxeles; dibujarlos todos sólo hace lento (y pesado) el dibujo. Estas funciones
+# eligen a lo sumo `puntos` puntos que conservan la forma de la serie.
+
+def lttb(x, y, puntos):
+    # Largest-Triangle-Three-Buckets: el primer y el último punto, y de cada tramo el que
+    # forma el triángulo más grande con el elegido en el tramo anterior y el promedio del
+    # siguiente. Los NaN (frames sin dato) se descartan antes de reducir.
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    validos = np.isfinite(y)
+    if not validos.all():
+        x, y = x[validos], y[validos]
+    n = len(x)
+    if puntos < 3 or n <= puntos:
+        return x, y
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(np.intp) # puntos-2 tramos entre el primero y el último
+    elegidos = np.empty(puntos, dtype=np.intp)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    xf = x.astype(float)
+    a = 0
+    for k in range(puntos - 2):
+        inicio, fin = bordes[k], bordes[k + 1]
+        siguiente = slice(fin, bordes[k + 2] if k + 2 < len(bordes) else n)
+        mx, my = xf[siguiente].mean(), y[siguiente].mean()
+        area = np.abs((xf[a] - mx) * (y[inicio:fin] - y[a]) - (xf[a] - xf[inicio:fin]) * (my - y[a]))
+        a = inicio + int(np.argmax(area))
+        elegidos[k + 1] = a
+    return x[elegidos], y[elegidos]
+
+def promedio_por_tramos(x, series, puntos):
+    # Para gráficas apiladas: el promedio de cada serie por tramo (todas con los mismos
+    # tramos, así que las capas siguen sumando lo mismo) y el primer x de cada tramo
+    x = np.asarray(x)
+    if len(x) <= puntos:
+        return x, [np.asarray(serie) for serie in series]
+    bordes = np.linspace(0, len(x), puntos + 1).astype(np.intp)
+    anchos = np.diff(bordes)
+    return x[bordes[:-1]], [np.add.reduceat(np.asarray(serie, dtype=float), bordes[:-1]) / anchos for serie in series]
+
+
+class ReductorMinMax:
+    # Reducción min/max incremental para una serie que crece: agrupa los valores en
+    # tramos de `ancho` frames y guarda sólo el mínimo y el máximo de cada uno. Cuando
+    # hay más de `puntos` tramos, junta los vecinos de a dos y duplica el ancho, así que
+    # agregar cuesta O(1) por valor y la serie reducida nunca pasa de `puntos` tramos.
+    def __init__(self, puntos=1000):
+        self.puntos = max(2, puntos)
+        self.ancho = 1
+        self.x = np.empty(0)
+        self.minimo = np.empty(0)
+        self.maximo = np.empty(0)
+        # El último tramo, todavía incompleto: primer x, mínimo, máximo y cuántos valores tiene
+        self._pendiente = None
+
+    def agregar(self, x, y):
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if self._pendiente is not None:
+            x0, menor, mayor, cuenta = self._pendiente
+            faltan = self.ancho - cuenta
+            menor = np.fmin.reduce(y[:faltan], initial=menor)
+            mayor = np.fmax.reduce(y[:faltan], initial=mayor)
+            self._pendiente = (x0, menor, mayor, cuenta + len(y[:faltan]))
+            x, y = x[faltan:], y[faltan:]
+            if self._pendiente[3] == self.ancho:
+                self._sumar([x0], [menor], [mayor])
+                self._pendiente = None
+        completos = len(y) // self.ancho * self.ancho
+        if completos:
+            tramos = y[:completos].reshape(-1, self.ancho)
+            self._sumar(x[:completos:self.ancho], np.fmin.reduce(tramos, axis=1), np.fmax.reduce(tramos, axis=1))
+        if completos < len(y):
+            resto = y[completos:]
+            self._pendiente = (x[completos], np.fmin.reduce(resto), np.fmax.reduce(resto), len(resto))
+        while len(self.x) > self.puntos:
+            if len(self.x) % 2: # El tramo suelto del final pasa a ser la primera mitad del pendiente
+                suelto = (self.x[-1], self.minimo[-1], self.maximo[-1], self.ancho)
+                if self._pendiente is not None:
+                    _, menor, mayor, cuenta = self._pendiente
+                    suelto = (suelto[0], np.fmin(suelto[1], menor), np.fmax(suelto[2], mayor), suelto[3] + cuenta)
+                self._pendiente = suelto
+                self.x, self.minimo, self.maximo = self.x[:-1], self.minimo[:-1], self.maximo[:-1]
+            self.x = self.x[::2]
+            self.minimo = np.fmin(self.minimo[::2], self.minimo[1::2])
+            self.maximo = np.fmax(self.maximo[::2], self.maximo[1::2])
+            self.ancho *= 2
+
+    def _sumar(self, x, minimo, maximo):
+        self.x = np.concatenate([self.x, x])
+        self.minimo = np.concatenate([self.minimo, minimo])
+        self.maximo = np.concatenate([self.maximo, maximo])
+
+    def datos(self):
+        # x e y para una línea: el mínimo y el máximo de cada tramo seguidos (con el pendiente)
+        x, minimo, maximo = self.x, self.minimo, self.maximo
+        if self._pendiente is not None:
+            x0, menor, mayor, _ = self._pendiente
+            x, minimo, maximo = np.append(x, x0), np.append(minimo, menor), np.append(maximo, mayor)
+        return np.repeat(x, 2), np.column_stack([minimo, maximo]).ravel()
+
+
+# Series de la gráfica en vivo: (columna del registro, etiqueta, color, panel)
+SERIES_EN_VIVO = (
+    ("estado_buscando", "Buscando", COLOR_RECURSO_MPL, (0, 0)),
+    ("estado_evadiendo", "Evadiendo", COLOR_PELIGRO_MPL, (0, 0)),
+    ("estado_explorando", "Explorando", COLOR_EXPLORANDO_MPL, (0, 0)),
+    ("dist_prom_peligro", "Dist. Prom. a Peligro", "magenta", (0, 1)),
+    ("dist_prom_recurso_buscando", "Dist. Prom. a Recurso (buscando)", "darkcyan", (1, 0)),
+    ("recursos_consumidos_total", "Total Recursos Consumidos", "darkorchid", (1, 1)),
+)
+TITULOS_EN_VIVO = {(0, 0): "Estados", (0, 1): "Distancia al Peligro",
+                   (1, 0): "Distancia al Recurso", (1, 1): "Recursos Consumidos"}
+
+
+class GraficaEnVivo:
+    # Ventana de matplotlib que sigue la corrida mientras avanza: se suscribe al
+    # RegistroEstadisticas y junta las filas nuevas; cada `cada` frames pasa sólo esas
+    # filas a un ReductorMinMax por serie y actualiza los datos de las líneas existentes
+    # (sin volver a crear la figura ni recorrer la historia). Dibujar cuesta lo mismo en
+    # el frame 100 que en el frame 1.000.000.
+    def __init__(self, registro, cada=30, puntos=1000):
+        import matplotlib.pyplot as plt # Sólo se carga si se pide la gráfica
+        self.plt = plt
+        self.registro = registro
+        self.cada = max(1, cada)
+        self._filas = []
+        self.reductores = {campo: ReductorMinMax(puntos) for campo, *_ in SERIES_EN_VIVO}
+        plt.ion()
+        self.fig, self.axs = plt.subplots(2, 2, figsize=(10, 7), constrained_layout=True)
+        self.fig.suptitle("Simulación en curso")
+        self.lineas = {}
+        for campo, etiqueta, color, panel in SERIES_EN_VIVO:
+            self.lineas[campo], = self.axs[panel].plot([], [], label=etiqueta, color=color, linewidth=1)
+        for panel, titulo in TITULOS_EN_VIVO.items():
+            self.axs[panel].set_title(titulo)
+            self.axs[panel].set_xlabel("Frame")
+            self.axs[panel].legend(loc="upper left", fontsize="small")
+            self.axs[panel].grid(True, linestyle=":", alpha=0.7)
+        registro.suscribir(self.agregar)
+        plt.show(block=False)
+
+    def agregar(self, fila):
+        self._filas.append(fila)
+        if len(self._filas) >= self.cada:
+            self.actualizar()
+
+    def actualizar(self):
+        if not self._filas:
+            return
+        x = [fila["frames"] for fila in self._filas]
+        for campo, reductor in self.reductores.items():
+            reductor.agregar(x, [fila[campo] for fila in self._filas])
+            self.lineas[campo].set_data(*reductor.datos())
+        self._filas.clear()
+        for ax in self.axs.flat:
+            ax.relim()
+            ax.autoscale_view()
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+
+    def cerrar(self):
+        # Deja de seguir al registro; la ventana queda abierta con los últimos datos
+        self.registro.desuscribir(self.agregar)
+        self.actualizar()
+        self.plt.ioff()
@@ -1,55 +1,27 @@
-import pygame
+import argparse
+import ast
+import contextlib
 import random
 import math
-import matplotlib.pyplot as plt
+import os
+import time
+
 import numpy as np
+import pygame
+
+from parametros import *
+from camara import Camara
+from campo_peligros import CampoPeligros
+from dibujo import Renderizador, dibujar_capas, superficie_circulo
+from graficas import GraficaEnVivo, lttb, promedio_por_tramos
+from perfil import SIN_PERFIL, Perfil
+from pool_entidades import PoolEntidades
+from planificador import VELOCIDADES, Planificador
+from registro import RegistroEstadisticas
+from rejilla_espacial import IndiceCeldas, RejillaEspacial
+from trayectorias import GrabadorTrayectorias
 
-# --- Constantes ---
-ANCHO_PANTALLA = 800
-ALTO_PANTALLA = 600
-FPS = 30
-MAX_FRAMES_SIMULACION = 1000 
-
-NUM_CRIATURAS_INICIALES = 30
-NUM_RECURSOS_INICIALES = 20
-NUM_PELIGROS = 2
-
-BLANCO = (255, 255, 255)
-NEGRO = (0, 0, 0)
-GRIS_CLARO = (200, 200, 200)
-COLOR_CRIATURA_RGB = (0, 150, 255)
-COLOR_PELIGRO_RGB = (255, 0, 0)
-COLOR_RECURSO_RGB = (0, 255, 0)
-COLOR_EXPLORANDO_RGB = (100, 100, 100)
-
-COLOR_CRIATURA_MPL = tuple(c/255 for c in COLOR_CRIATURA_RGB)
-COLOR_PELIGRO_MPL = tuple(c/255 for c in COLOR_PELIGRO_RGB)
-COLOR_RECURSO_MPL = tuple(c/255 for c in COLOR_RECURSO_RGB)
-COLOR_EXPLORANDO_MPL = tuple(c/255 for c in COLOR_EXPLORANDO_RGB)
-
-
-RADIO_CRIATURA = 8
-RADIO_RECURSO = 5
-RADIO_PELIGRO_VISUAL = 15
-VELOCIDAD_MAX_CRIATURA = 2.5
-FUERZA_MAX_DIRECCION = 0.1 # Steering force limit
-RADIO_VISION_RECURSO_CRIATURA = 100
-RADIO_VISION_PELIGRO_CRIATURA = 120
-RADIO_VISION_OTRA_CRIATURA = 50 # Para cohesión
-DISTANCIA_SEPARACION_CRIATURA = 25 # Para separación
-UMBRAL_CONSUMO_RECURSO = RADIO_CRIATURA + RADIO_RECURSO
-
-# --- Variables para Estadísticas ---
-datos_frames = []
-datos_num_criaturas_vivas = []
-datos_num_recursos_disponibles = []
-datos_recursos_consumidos_total = []
-total_recursos_consumidos_acumulado = 0
-datos_estado_buscando = []
-datos_estado_evadiendo = []
-datos_estado_explorando = []
-datos_dist_prom_peligro = []
-datos_dist_prom_recurso_buscando = []
+EPSILON_VECTOR = 1e-6 # Vector2.scale_to_length no acepta vectores más cortos que esto
 
 # --- Clases de Agentes ---
 class AgenteBase(pygame.sprite.Sprite):
@@ -60,9 +32,21 @@ class AgenteBase(pygame.sprite.Sprite):
         self.radio = radio
         self.mundo_ancho = mundo_ancho
         self.mundo_alto = mundo_alto
-        self.image = pygame.Surface([radio * 2, radio * 2], pygame.SRCALPHA)
-        pygame.draw.circle(self.image, self.color_rgb, (radio, radio), radio)
-        self.rect = self.image.get_rect(center=(int(self.posicion.x), int(self.posicion.y)))
+        self.rect = pygame.Rect(0, 0, radio * 2, radio * 2)
+        self.rect.center = (int(self.posicion.x), int(self.posicion.y))
+
+    def reiniciar(self, x, y, mundo_ancho, mundo_alto):
+        # Deja al agente como recién creado en (x, y), para reciclarlo desde un PoolEntidades
+        self.posicion = pygame.math.Vector2(x, y)
+        self.mundo_ancho = mundo_ancho
+        self.mundo_alto = mundo_alto
+        self.update_rect()
+
+    @property
+    def image(self):
+        # Una superficie compartida por todos los agentes del mismo color y radio,
+        # creada al dibujar por primera vez (sin ventana nunca se crea)
+        return superficie_circulo(self.color_rgb, self.radio)
 
     def update_rect(self):
         self.rect.center = (int(self.posicion.x), int(self.posicion.y))
@@ -72,20 +56,57 @@ class Recurso(AgenteBase):
         super().__init__(x, y, COLOR_RECURSO_RGB, RADIO_RECURSO, mundo_ancho, mundo_alto)
         self.disponible = True
 
+    def reiniciar(self, x, y, mundo_ancho, mundo_alto):
+        super().reiniciar(x, y, mundo_ancho, mundo_alto)
+        self.disponible = True
+
 class Peligro(AgenteBase):
     def __init__(self, x, y, mundo_ancho, mundo_alto):
         super().__init__(x, y, COLOR_PELIGRO_RGB, RADIO_PELIGRO_VISUAL, mundo_ancho, mundo_alto)
 
+class GrupoIndexado(pygame.sprite.Group):
+    # Grupo de sprites que mantiene una RejillaEspacial al día: add() inserta y
+    # kill()/remove() eliminan, así que el índice nunca se reconstruye entero
+    def __init__(self, rejilla, *sprites):
+        self.rejilla = rejilla
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.rejilla.insertar(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.rejilla.eliminar(sprite)
+
 class Criatura(AgenteBase):
-    def __init__(self, x, y, mundo_ancho, mundo_alto):
+    def __init__(self, x, y, mundo_ancho, mundo_alto, rng=random):
         super().__init__(x, y, COLOR_CRIATURA_RGB, RADIO_CRIATURA, mundo_ancho, mundo_alto)
-        self.velocidad = pygame.math.Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
+        self.rng = rng # Generador de la simulación (por defecto, el global de random)
+        self._iniciar()
+
+    def reiniciar(self, x, y, mundo_ancho, mundo_alto, rng=None):
+        super().reiniciar(x, y, mundo_ancho, mundo_alto)
+        if rng is not None:
+            self.rng = rng
+        self._iniciar()
+
+    def _iniciar(self):
+        # Velocidad al azar y nada percibido todavía
+        rng = self.rng
+        self.velocidad = pygame.math.Vector2(rng.uniform(-1, 1), rng.uniform(-1, 1))
         if self.velocidad.length_squared() > 0: # Usar length_squared para eficiencia
             self.velocidad.scale_to_length(VELOCIDAD_MAX_CRIATURA)
         else:
-            self.velocidad = pygame.math.Vector2(random.choice([-1.0,1.0]), random.choice([-1.0,1.0])) 
+            self.velocidad = pygame.math.Vector2(rng.choice([-1.0,1.0]), rng.choice([-1.0,1.0])) 
             self.velocidad.scale_to_length(VELOCIDAD_MAX_CRIATURA)
-        self.estado_actual = "EXPLORANDO" # Estado inicial por defecto
+        self.estado_actual = ESTADO_EXPLORANDO # Código entero (índice en ESTADOS); explorando por defecto
+        # Lo que se midió de los peligros desde posicion_medida (ver medir_peligros)
+        self.posicion_medida = None
+        self.peligros_a_la_vista = []
+        self.dist_min_peligro = float('inf')
+        self.recursos_al_alcance = []
+        self.dist_objetivo = np.nan # Distancia al recurso perseguido al terminar el paso (NaN si no busca)
 
     def limitar_fuerza(self, fuerza, max_fuerza):
         if fuerza.length_squared() > max_fuerza**2:
@@ -102,45 +123,52 @@ class Criatura(AgenteBase):
             direccion_deseada *= -1
         
         dist_a_obj = direccion_deseada.length()
-        if dist_a_obj == 0: 
+        if dist_a_obj < EPSILON_VECTOR: 
             return pygame.math.Vector2(0, 0)
 
         direccion_deseada.scale_to_length(VELOCIDAD_MAX_CRIATURA)
         fuerza_giro = direccion_deseada - self.velocidad
         return self.limitar_fuerza(fuerza_giro, FUERZA_MAX_DIRECCION)
 
-    def evadir(self, peligros_lista):
-        fuerza_acumulada = pygame.math.Vector2(0, 0)
-        count = 0
+    # --- Percepción: un solo recorrido por cada tipo de entidad ---
+    def medir_peligros(self, peligros_lista):
+        # Distancia a cada peligro desde la posición actual: guarda los que están a la
+        # vista (para evadir) y la distancia al más cercano (para las estadísticas).
+        # Los peligros no se mueven, así que lo medido al terminar un frame sirve
+        # tal cual para evadir al empezar el siguiente.
+        self.peligros_a_la_vista = []
+        dist_min = float('inf')
         for p_obj in peligros_lista:
             dist = self.posicion.distance_to(p_obj.posicion)
+            if dist < dist_min:
+                dist_min = dist
             if 0 < dist < RADIO_VISION_PELIGRO_CRIATURA:
-                fuerza = self.calcular_direccion_deseada(p_obj.posicion, es_alejarse=True)
-                fuerza *= (RADIO_VISION_PELIGRO_CRIATURA / dist) if dist > 0 else RADIO_VISION_PELIGRO_CRIATURA
-                fuerza_acumulada += fuerza
-                count += 1
-        if count > 0:
-            fuerza_acumulada /= count
-            return self.limitar_fuerza(fuerza_acumulada, FUERZA_MAX_DIRECCION * 1.5)
-        return pygame.math.Vector2(0, 0)
-
-    def buscar(self, recursos_lista):
+                self.peligros_a_la_vista.append((p_obj, dist))
+        self.dist_min_peligro = dist_min
+        self.posicion_medida = pygame.math.Vector2(self.posicion)
+
+    def percibir_recursos(self, recursos_lista):
+        # El disponible más cercano a la vista y, de paso, los que podrían quedar al
+        # alcance para consumir después de moverse (como mucho VELOCIDAD_MAX_CRIATURA)
+        alcance = UMBRAL_CONSUMO_RECURSO + VELOCIDAD_MAX_CRIATURA + 1
+        self.recursos_al_alcance = []
         recurso_mas_cercano = None
         dist_min = float('inf')
         for r_obj in recursos_lista:
             if r_obj.disponible:
                 dist = self.posicion.distance_to(r_obj.posicion)
+                if dist < alcance:
+                    self.recursos_al_alcance.append(r_obj)
                 if 0 < dist < RADIO_VISION_RECURSO_CRIATURA and dist < dist_min:
                     dist_min = dist
                     recurso_mas_cercano = r_obj
-        if recurso_mas_cercano:
-            fuerza = self.calcular_direccion_deseada(recurso_mas_cercano.posicion)
-            return fuerza, recurso_mas_cercano
-        return pygame.math.Vector2(0, 0), None
+        return recurso_mas_cercano
 
-    def separar(self, otras_criaturas_lista):
-        fuerza_acumulada = pygame.math.Vector2(0,0)
-        count = 0
+    def percibir_criaturas(self, otras_criaturas_lista):
+        # Sumas para la separación y la cohesión con una sola distancia por vecino
+        suma_separacion = pygame.math.Vector2(0,0)
+        centro_masa_vecinos = pygame.math.Vector2(0,0)
+        n_separacion, n_cohesion = 0, 0
         for otra in otras_criaturas_lista:
             if otra != self:
                 dist = self.posicion.distance_to(otra.posicion)
@@ -149,76 +177,100 @@ class Criatura(AgenteBase):
                     if diff.length_squared() > 0: 
                         diff.normalize_ip()
                         diff /= dist 
-                        fuerza_acumulada += diff
-                        count +=1
-        if count > 0:
-            fuerza_acumulada /= count
-            if fuerza_acumulada.length_squared() > 0:
+                        suma_separacion += diff
+                        n_separacion += 1
+                if dist < RADIO_VISION_OTRA_CRIATURA:
+                    centro_masa_vecinos += otra.posicion
+                    n_cohesion += 1
+        return suma_separacion, n_separacion, centro_masa_vecinos, n_cohesion
+
+    # --- Fuerzas a partir de lo percibido ---
+    def evadir(self):
+        fuerza_acumulada = pygame.math.Vector2(0, 0)
+        for p_obj, dist in self.peligros_a_la_vista:
+            fuerza = self.calcular_direccion_deseada(p_obj.posicion, es_alejarse=True)
+            fuerza *= RADIO_VISION_PELIGRO_CRIATURA / dist
+            fuerza_acumulada += fuerza
+        if self.peligros_a_la_vista:
+            fuerza_acumulada /= len(self.peligros_a_la_vista)
+            return self.limitar_fuerza(fuerza_acumulada, FUERZA_MAX_DIRECCION * 1.5)
+        return pygame.math.Vector2(0, 0)
+
+    def buscar(self, recurso_mas_cercano):
+        if recurso_mas_cercano:
+            return self.calcular_direccion_deseada(recurso_mas_cercano.posicion)
+        return pygame.math.Vector2(0, 0)
+
+    def separar(self, suma_separacion, n_separacion):
+        if n_separacion > 0:
+            fuerza_acumulada = suma_separacion / n_separacion
+            if fuerza_acumulada.length_squared() > EPSILON_VECTOR ** 2:
                 fuerza_acumulada.scale_to_length(VELOCIDAD_MAX_CRIATURA)
             fuerza_giro = fuerza_acumulada - self.velocidad
             return self.limitar_fuerza(fuerza_giro, FUERZA_MAX_DIRECCION * 1.2)
         return pygame.math.Vector2(0, 0)
 
-    def cohesionar(self, otras_criaturas_lista):
-        centro_masa_vecinos = pygame.math.Vector2(0,0)
-        count = 0
-        for otra in otras_criaturas_lista:
-            if otra != self:
-                if self.posicion.distance_to(otra.posicion) < RADIO_VISION_OTRA_CRIATURA:
-                    centro_masa_vecinos += otra.posicion
-                    count += 1
-        if count > 0:
-            centro_masa_vecinos /= count
-            return self.calcular_direccion_deseada(centro_masa_vecinos)
+    def cohesionar(self, centro_masa_vecinos, n_cohesion):
+        if n_cohesion > 0:
+            return self.calcular_direccion_deseada(centro_masa_vecinos / n_cohesion)
         return pygame.math.Vector2(0, 0)
 
     def explorar(self):
         circulo_futuro = self.velocidad.copy()
-        if circulo_futuro.length_squared() == 0: 
-            circulo_futuro = pygame.math.Vector2(random.uniform(-1,1), random.uniform(-1,1))
+        if circulo_futuro.length_squared() < EPSILON_VECTOR ** 2: 
+            circulo_futuro = pygame.math.Vector2(self.rng.uniform(-1,1), self.rng.uniform(-1,1))
         
         circulo_futuro.scale_to_length(20) 
-        desplazamiento = pygame.math.Vector2(random.uniform(-1,1), random.uniform(-1,1))
+        desplazamiento = pygame.math.Vector2(self.rng.uniform(-1,1), self.rng.uniform(-1,1))
         desplazamiento.scale_to_length(10) 
         
         fuerza_exploracion = circulo_futuro + desplazamiento
         return self.calcular_direccion_deseada(self.posicion + fuerza_exploracion) 
 
-    def actualizar_comportamiento(self, recursos_lista, peligros_lista, otras_criaturas_lista):
-        # Pesos para las fuerzas
-        PESO_EVASION = 2.5
-        PESO_SEPARACION = 1.8
-        PESO_BUSQUEDA = 1.0
-        PESO_COHESION = 0.5
-        PESO_EXPLORACION = 0.3
-
-        f_evasion = self.evadir(peligros_lista)
-        f_separacion = self.separar(otras_criaturas_lista)
-        f_busqueda, recurso_obj = self.buscar(recursos_lista)
-        f_cohesion = self.cohesionar(otras_criaturas_lista)
-        f_exploracion = self.explorar() 
-
+    def actualizar_comportamiento(self, recursos_lista, peligros_lista, otras_criaturas_lista, rejilla_criaturas=None, rejilla_recursos=None,
+                                  campo_peligros=None, perfil=SIN_PERFIL):
+        if rejilla_criaturas is not None:
+            # Sólo las criaturas de las celdas cercanas pueden estar dentro de los radios
+            radio_vecindad = max(DISTANCIA_SEPARACION_CRIATURA, RADIO_VISION_OTRA_CRIATURA)
+            otras_criaturas_lista = rejilla_criaturas.consultar(self.posicion, radio_vecindad)
+        if rejilla_recursos is not None:
+            recursos_lista = rejilla_recursos.consultar(self.posicion, RADIO_VISION_RECURSO_CRIATURA)
+        if self.posicion_medida != self.posicion: # Sólo en el primer frame (o si alguien la movió)
+            if campo_peligros is not None:
+                peligros_lista = campo_peligros.peligros_en(self.posicion)
+            self.medir_peligros(peligros_lista)
+            perfil.contar("distancias", len(peligros_lista))
+        perfil.contar("candidatos_vecinos", len(otras_criaturas_lista))
+        perfil.contar("distancias", len(otras_criaturas_lista) + len(recursos_lista))
+
+        suma_separacion, n_separacion, centro_masa_vecinos, n_cohesion = self.percibir_criaturas(otras_criaturas_lista)
+        recurso_obj = self.percibir_recursos(recursos_lista)
+        perfil.marcar("percepcion")
+
+        # Sólo se calculan las fuerzas del estado que domina (y la separación, que siempre se aplica)
+        f_evasion = self.evadir()
+        f_separacion = self.separar(suma_separacion, n_separacion)
         fuerza_final = pygame.math.Vector2(0,0)
         
         if f_evasion.length_squared() > 0:
-            self.estado_actual = "EVADIENDO"
+            self.estado_actual = ESTADO_EVADIENDO
             fuerza_final += f_evasion * PESO_EVASION
-        elif f_busqueda.length_squared() > 0:
-            self.estado_actual = "BUSCANDO"
+        elif (f_busqueda := self.buscar(recurso_obj)).length_squared() > 0:
+            self.estado_actual = ESTADO_BUSCANDO
             fuerza_final += f_busqueda * PESO_BUSQUEDA
         else:
-            self.estado_actual = "EXPLORANDO" # Por defecto si no hay evasión ni búsqueda
-            # Si explora, la cohesión puede influir
-            fuerza_final += f_cohesion * PESO_COHESION
-            fuerza_final += f_exploracion * PESO_EXPLORACION # Exploración más activa si no hay otros objetivos
+            self.estado_actual = ESTADO_EXPLORANDO # Por defecto si no hay evasión ni búsqueda
+            f_cohesion = self.cohesionar(centro_masa_vecinos, n_cohesion)
+            if f_cohesion.length_squared() > 0:
+                # Si explora, la cohesión puede influir
+                fuerza_final += f_cohesion * PESO_COHESION
+                fuerza_final += self.explorar() * PESO_EXPLORACION
+            else:
+                # Si ninguna fuerza principal fue fuerte, la exploración base toma más relevancia
+                fuerza_final += self.explorar() * PESO_EXPLORACION * 1.5
         
         # La separación siempre se aplica, sumada a la fuerza dominante
         fuerza_final += f_separacion * PESO_SEPARACION
-        
-        # Si ninguna fuerza principal fue fuerte, la exploración base toma más relevancia
-        if self.estado_actual == "EXPLORANDO" and f_cohesion.length_squared() == 0 :
-             fuerza_final = self.explorar() * PESO_EXPLORACION * 1.5 
-             fuerza_final += f_separacion * PESO_SEPARACION 
 
 
         self.velocidad += fuerza_final 
@@ -228,215 +280,580 @@ class Criatura(AgenteBase):
         return recurso_obj 
 
     def mantener_en_pantalla(self):
+        # Devuelve True si la criatura pasó al borde opuesto
         buffer = self.radio
+        anterior = (self.posicion.x, self.posicion.y)
         if self.posicion.x > self.mundo_ancho + buffer: self.posicion.x = -buffer
         elif self.posicion.x < -buffer: self.posicion.x = self.mundo_ancho + buffer
         if self.posicion.y > self.mundo_alto + buffer: self.posicion.y = -buffer
         elif self.posicion.y < -buffer: self.posicion.y = self.mundo_alto + buffer
+        return anterior != (self.posicion.x, self.posicion.y)
         
-    def update(self, recursos_lista, peligros_lista, otras_criaturas_lista):
-        recurso_objetivo_perseguido = self.actualizar_comportamiento(recursos_lista, peligros_lista, otras_criaturas_lista)
+    def update(self, recursos_lista, peligros_lista, otras_criaturas_lista, rejilla_criaturas=None, rejilla_recursos=None,
+               campo_peligros=None, perfil=SIN_PERFIL):
+        recurso_objetivo_perseguido = self.actualizar_comportamiento(recursos_lista, peligros_lista, otras_criaturas_lista,
+                                                                     rejilla_criaturas, rejilla_recursos, campo_peligros, perfil)
         self.posicion += self.velocidad
-        self.mantener_en_pantalla()
+        salto_de_borde = self.mantener_en_pantalla()
         self.update_rect()
-
-        recursos_consumidos_ahora = 0
+        if rejilla_criaturas is not None:
+            rejilla_criaturas.mover(self)
+        perfil.marcar("direccion")
+
+        # Los recursos al alcance ya se juntaron al percibir, salvo que la criatura haya
+        # saltado al otro borde o que la consulta de la rejilla no cubriera ese alcance
+        alcance = UMBRAL_CONSUMO_RECURSO + VELOCIDAD_MAX_CRIATURA + 1
+        if not salto_de_borde and (rejilla_recursos is None or RADIO_VISION_RECURSO_CRIATURA >= alcance):
+            recursos_lista = self.recursos_al_alcance
+        elif rejilla_recursos is not None:
+            recursos_lista = rejilla_recursos.consultar(self.posicion, UMBRAL_CONSUMO_RECURSO)
+        perfil.contar("distancias", len(recursos_lista))
+        recursos_consumidos_ahora = []
         for r in recursos_lista:
             if r.disponible and self.posicion.distance_to(r.posicion) < UMBRAL_CONSUMO_RECURSO:
                 r.disponible = False
-                recursos_consumidos_ahora += 1
-        return recursos_consumidos_ahora, recurso_objetivo_perseguido
-
-
-# --- Inicialización de Pygame y Entidades ---
-pygame.init()
-pantalla = pygame.display.set_mode((ANCHO_PANTALLA, ALTO_PANTALLA))
-pygame.display.set_caption("Simulación ODD con Gráficas Detalladas")
-reloj = pygame.time.Clock()
-fuente_debug = pygame.font.Font(None, 22) 
-fuente_frames = pygame.font.Font(None, 30)
-
-todas_las_sprites = pygame.sprite.Group()
-criaturas_grupo = pygame.sprite.Group()
-recursos_grupo = pygame.sprite.Group()
-peligros_grupo = pygame.sprite.Group()
-
-def crear_nuevo_recurso():
-    # Intenta no poner recursos encima de peligros
-    for _ in range(10): 
-        x = random.randrange(RADIO_RECURSO, ANCHO_PANTALLA - RADIO_RECURSO)
-        y = random.randrange(RADIO_RECURSO, ALTO_PANTALLA - RADIO_RECURSO)
-        nueva_pos = pygame.math.Vector2(x,y)
-        muy_cerca_de_peligro = False
-        for p in peligros_grupo:
-            if nueva_pos.distance_to(p.posicion) < RADIO_PELIGRO_VISUAL * 2:
-                muy_cerca_de_peligro = True
-                break
-        if not muy_cerca_de_peligro:
-            recurso = Recurso(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
-            todas_las_sprites.add(recurso)
-            recursos_grupo.add(recurso)
-            return recurso
-    # Si falla, ponerlo en cualquier lado
-    recurso = Recurso(random.randrange(RADIO_RECURSO, ANCHO_PANTALLA - RADIO_RECURSO), 
-                      random.randrange(RADIO_RECURSO, ALTO_PANTALLA - RADIO_RECURSO), 
-                      ANCHO_PANTALLA, ALTO_PANTALLA)
-    todas_las_sprites.add(recurso)
-    recursos_grupo.add(recurso)
-    return recurso
-
-
-for _ in range(NUM_CRIATURAS_INICIALES):
-    criatura = Criatura(random.randrange(ANCHO_PANTALLA), random.randrange(ALTO_PANTALLA), ANCHO_PANTALLA, ALTO_PANTALLA)
-    todas_las_sprites.add(criatura)
-    criaturas_grupo.add(criatura)
-
-# Crear peligros primero para que los recursos no caigan encima fácilmente
-for i in range(NUM_PELIGROS):
-    if i == 0: x, y = ANCHO_PANTALLA * 0.25, ALTO_PANTALLA * 0.25
-    elif i == 1: x, y = ANCHO_PANTALLA * 0.75, ALTO_PANTALLA * 0.75
-    else:
-        x = random.randrange(RADIO_PELIGRO_VISUAL, ANCHO_PANTALLA - RADIO_PELIGRO_VISUAL)
-        y = random.randrange(RADIO_PELIGRO_VISUAL, ALTO_PANTALLA - RADIO_PELIGRO_VISUAL)
-    peligro = Peligro(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
-    todas_las_sprites.add(peligro)
-    peligros_grupo.add(peligro)
-
-for _ in range(NUM_RECURSOS_INICIALES):
-    crear_nuevo_recurso()
-
-# --- Bucle Principal de Simulación ---
-ejecutando = True
-mostrar_debug_info = True # Por defecto activado
-frame_actual = 0
-
-print("Iniciando simulación Pygame...")
-
-while ejecutando and frame_actual < MAX_FRAMES_SIMULACION:
-    frame_actual += 1
-    recursos_consumidos_en_este_frame = 0
-    
-    # Contadores de estados y listas para distancias (resetear cada frame)
-    count_buscando, count_evadiendo, count_explorando = 0, 0, 0
-    distancias_a_peligros_frame = []
-    distancias_a_recursos_buscando_frame = []
-
-    for evento in pygame.event.get():
-        if evento.type == pygame.QUIT:
-            ejecutando = False
-        if evento.type == pygame.KEYDOWN:
-            if evento.key == pygame.K_r: 
-                for _ in range(5): crear_nuevo_recurso()
-            if evento.key == pygame.K_d: 
-                mostrar_debug_info = not mostrar_debug_info
-            if evento.key == pygame.K_ESCAPE or evento.key == pygame.K_q: 
+                recursos_consumidos_ahora.append(r)
+        perfil.marcar("consumo")
+
+        # Peligros desde la nueva posición: distancia mínima para las estadísticas de este
+        # frame y peligros a la vista para evadir en el siguiente (con el campo, sólo los
+        # candidatos de la celda, que dan el mismo resultado)
+        if campo_peligros is not None:
+            peligros_lista = campo_peligros.peligros_en(self.posicion)
+        self.medir_peligros(peligros_lista)
+        perfil.contar("distancias", len(peligros_lista))
+        perfil.marcar("percepcion")
+        # Y la distancia al recurso que persigue, si sigue disponible (para la eficiencia de búsqueda)
+        self.dist_objetivo = np.nan
+        if self.estado_actual == ESTADO_BUSCANDO and recurso_objetivo_perseguido and recurso_objetivo_perseguido.disponible:
+            self.dist_objetivo = self.posicion.distance_to(recurso_objetivo_perseguido.posicion)
+        perfil.marcar("estadisticas")
+        return recursos_consumidos_ahora
+
+
+# --- Simulación ---
+class Simulacion:
+    # Estado completo de una corrida: entidades, contadores y estadísticas.
+    # Con MOTOR = "objetos" usa los sprites de arriba (modelo de referencia) y con
+    # MOTOR = "vectorizado" delega en MotorVectorizado (o en MotorParalelo, que
+    # reparte sus pasos entre varios procesos, con "paralelo"). Las clases de agentes leen
+    # las constantes de este módulo, así que los parámetros se aplican sobre ellas
+    # mientras la simulación construye o avanza el mundo.
+    # Con `instantanea` (los arrays de guardar_instantanea) el mundo se restaura en
+    # vez de crearse, y la corrida sigue exactamente como habría seguido.
+    def __init__(self, parametros=None, instantanea=None):
+        self.p = resolver_parametros(parametros)
+        self.frame_actual = 0
+        self.total_recursos_consumidos = 0
+        self.perfil = SIN_PERFIL # Un perfil.Perfil para medir los tiempos de cada fase
+        self._indice_peligros = None # IndiceCeldas de los peligros para dibujar con cámara (se crea al usarlo)
+        registro = None
+        if instantanea is not None:
+            self.frame_actual, self.total_recursos_consumidos = instantanea["contadores"].tolist()
+            registro = _subconjunto(instantanea, "registro/")
+        self.registro = RegistroEstadisticas(directorio=self.p["DIRECTORIO_ESTADISTICAS"],
+                                             filas_por_bloque=self.p["FRAMES_POR_BLOQUE_ESTADISTICAS"],
+                                             instantanea=registro)
+        with self._constantes():
+            if self.p["MOTOR"] in ("vectorizado", "paralelo"):
+                if self.p["MOTOR"] == "paralelo":
+                    from motor_paralelo import MotorParalelo as Motor
+                else:
+                    from motor_vectorizado import MotorVectorizado as Motor
+                motor = None if instantanea is None else _subconjunto(instantanea, "motor/")
+                self.motor = Motor(self.p, semilla=self.p["SEMILLA"], instantanea=motor)
+            elif self.p["MOTOR"] == "objetos":
+                self.motor = None
+                self.rng = random.Random(self.p["SEMILLA"])
+                if instantanea is None:
+                    self._crear_entidades()
+                else:
+                    self._restaurar_entidades(instantanea)
+            else:
+                raise ValueError(f"Motor desconocido: {self.p['MOTOR']}")
+        self.grabador = None
+        if self.p["DIRECTORIO_TRAYECTORIA"]:
+            # Graba desde el estado inicial (o desde donde sigue la instantánea)
+            self.grabador = GrabadorTrayectorias(self.p["DIRECTORIO_TRAYECTORIA"], self.p, self.campo_peligros.posiciones,
+                                                 self.p["FRAMES_POR_BLOQUE_TRAYECTORIA"])
+            self._grabar()
+
+    @contextlib.contextmanager
+    def _constantes(self):
+        modulo = globals()
+        originales = {nombre: modulo[nombre] for nombre in self.p if nombre in modulo}
+        modulo.update(self.p)
+        try:
+            yield
+        finally:
+            modulo.update(originales)
+
+    def _crear_grupos(self):
+        self.todas_las_sprites = pygame.sprite.Group()
+        self.criaturas_grupo = pygame.sprite.Group()
+        self.recursos_grupo = GrupoIndexado(RejillaEspacial(ANCHO_PANTALLA, ALTO_PANTALLA, RADIO_VISION_RECURSO_CRIATURA / 2))
+        self.peligros_grupo = pygame.sprite.Group()
+        # Criaturas y recursos se crean y se dan de baja a través de sus pools (que reciclan los objetos)
+        self.criaturas = PoolEntidades(Criatura, self.todas_las_sprites, self.criaturas_grupo)
+        self.recursos = PoolEntidades(Recurso, self.todas_las_sprites, self.recursos_grupo)
+        # Rejilla para las consultas de vecinos (separación y cohesión)
+        self.rejilla_criaturas = RejillaEspacial(ANCHO_PANTALLA, ALTO_PANTALLA,
+                                                 max(DISTANCIA_SEPARACION_CRIATURA, RADIO_VISION_OTRA_CRIATURA),
+                                                 margen=RADIO_CRIATURA)
+
+    def _crear_entidades(self):
+        self._crear_grupos()
+        for _ in range(NUM_CRIATURAS_INICIALES):
+            self.criaturas.crear(self.rng.randrange(ANCHO_PANTALLA), self.rng.randrange(ALTO_PANTALLA), ANCHO_PANTALLA, ALTO_PANTALLA, self.rng)
+
+        # Crear peligros primero para que los recursos no caigan encima fácilmente
+        for i in range(NUM_PELIGROS):
+            if i == 0: x, y = ANCHO_PANTALLA * 0.25, ALTO_PANTALLA * 0.25
+            elif i == 1: x, y = ANCHO_PANTALLA * 0.75, ALTO_PANTALLA * 0.75
+            else:
+                x = self.rng.randrange(RADIO_PELIGRO_VISUAL, ANCHO_PANTALLA - RADIO_PELIGRO_VISUAL)
+                y = self.rng.randrange(RADIO_PELIGRO_VISUAL, ALTO_PANTALLA - RADIO_PELIGRO_VISUAL)
+            peligro = Peligro(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
+            self.todas_las_sprites.add(peligro)
+            self.peligros_grupo.add(peligro)
+        self._crear_campo_peligros()
+
+        for _ in range(NUM_RECURSOS_INICIALES):
+            self.crear_nuevo_recurso()
+
+    def _crear_campo_peligros(self):
+        # Los peligros ya no cambian: evasión, distancia mínima y lugar de los recursos salen del campo
+        peligros = list(self.peligros_grupo)
+        self._campo_peligros = CampoPeligros([tuple(p.posicion) for p in peligros], ANCHO_PANTALLA, ALTO_PANTALLA,
+                                            RADIO_VISION_PELIGRO_CRIATURA, RADIO_PELIGRO_VISUAL * 2,
+                                            CELDA_CAMPO_PELIGROS, RADIO_CRIATURA + VELOCIDAD_MAX_CRIATURA + 1, peligros)
+
+    def _restaurar_entidades(self, datos):
+        # Mismo orden de los grupos que al guardar (de él dependen los empates y el orden de actualización)
+        self._crear_grupos()
+        for (x, y), (vx, vy), estado in zip(datos["criaturas_pos"].tolist(), datos["criaturas_vel"].tolist(),
+                                           datos["criaturas_estado"].tolist()):
+            criatura = self.criaturas.crear(x, y, ANCHO_PANTALLA, ALTO_PANTALLA, self.rng)
+            criatura.velocidad = pygame.math.Vector2(vx, vy)
+            criatura.estado_actual = estado
+        for x, y in datos["peligros_pos"].tolist():
+            peligro = Peligro(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
+            self.todas_las_sprites.add(peligro)
+            self.peligros_grupo.add(peligro)
+        self._crear_campo_peligros()
+        for (x, y), disponible in zip(datos["recursos_pos"].tolist(), datos["recursos_disponible"].tolist()):
+            recurso = self.recursos.crear(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
+            recurso.disponible = disponible
+        # Al final, porque crear las criaturas consume números del generador
+        self.rng.setstate(ast.literal_eval(str(datos["rng"])))
+
+    def guardar_instantanea(self, ruta):
+        # Todo el estado en un .npz comprimido: parámetros, contadores, estadísticas
+        # acumuladas, generador aleatorio y entidades. Se escribe a un archivo
+        # temporal y se renombra, así que un corte a mitad no deja la anterior rota.
+        datos = {
+            "parametros": np.array(repr(self.p)),
+            "contadores": np.array([self.frame_actual, self.total_recursos_consumidos]),
+        }
+        datos.update({f"registro/{nombre}": valor for nombre, valor in self.registro.instantanea().items()})
+        if self.motor is not None:
+            datos.update({f"motor/{nombre}": valor for nombre, valor in self.motor.instantanea().items()})
+        else:
+            recursos = list(self.recursos_grupo)
+            datos["criaturas_pos"], datos["criaturas_vel"], datos["criaturas_estado"] = self.estado_criaturas()
+            datos["peligros_pos"] = np.array([tuple(p.posicion) for p in self.peligros_grupo], dtype=float).reshape(-1, 2)
+            datos["recursos_pos"] = np.array([tuple(r.posicion) for r in recursos], dtype=float).reshape(-1, 2)
+            datos["recursos_disponible"] = np.array([r.disponible for r in recursos], dtype=bool)
+            datos["rng"] = np.array(repr(self.rng.getstate()))
+        temporal = f"{ruta}.tmp.npz"
+        np.savez_compressed(temporal, **datos)
+        os.replace(temporal, ruta)
+
+    @property
+    def campo_peligros(self):
+        return self.motor.campo_peligros if self.motor is not None else self._campo_peligros
+
+    def estado_criaturas(self):
+        # Posiciones, velocidades y códigos de estado (índices de ESTADOS) como arrays
+        if self.motor is not None:
+            return self.motor.pos, self.motor.vel, self.motor.estado
+        criaturas = list(self.criaturas_grupo)
+        return (np.array([tuple(c.posicion) for c in criaturas], dtype=float).reshape(-1, 2),
+                np.array([tuple(c.velocidad) for c in criaturas], dtype=float).reshape(-1, 2),
+                np.fromiter((c.estado_actual for c in criaturas), dtype=np.int8, count=len(criaturas)))
+
+    def estado_recursos(self):
+        # Posición y disponibilidad de cada lugar de recurso; los lugares (filas del
+        # motor o entidades del pool) no cambian de orden entre frames
+        if self.motor is not None:
+            return self.motor.recursos_pos, self.motor.recursos_disponible
+        recursos = self.recursos.entidades
+        return (np.array([tuple(r.posicion) for r in recursos], dtype=float).reshape(-1, 2),
+                np.array([r.alive() and r.disponible for r in recursos], dtype=bool))
+
+    def _grabar(self):
+        self.grabador.grabar(self.frame_actual, *self.estado_criaturas(), *self.estado_recursos())
+
+    def crear_nuevo_recurso(self):
+        # Intenta no poner recursos encima de peligros (reutiliza un recurso liberado si hay)
+        for _ in range(10): 
+            x = self.rng.randrange(RADIO_RECURSO, ANCHO_PANTALLA - RADIO_RECURSO)
+            y = self.rng.randrange(RADIO_RECURSO, ALTO_PANTALLA - RADIO_RECURSO)
+            if not self.campo_peligros.es_prohibido(x, y): # A menos de RADIO_PELIGRO_VISUAL * 2 de algún peligro
+                return self.recursos.crear(x, y, ANCHO_PANTALLA, ALTO_PANTALLA)
+        # Si falla, ponerlo en cualquier lado
+        return self.recursos.crear(self.rng.randrange(RADIO_RECURSO, ANCHO_PANTALLA - RADIO_RECURSO), 
+                                   self.rng.randrange(RADIO_RECURSO, ALTO_PANTALLA - RADIO_RECURSO), 
+                                   ANCHO_PANTALLA, ALTO_PANTALLA)
+
+    def agregar_recursos(self, cantidad):
+        with self._constantes():
+            if self.motor is not None:
+                self.motor.agregar_recursos(cantidad)
+            else:
+                for _ in range(cantidad): self.crear_nuevo_recurso()
+
+    def paso(self):
+        # Avanza un frame y registra sus estadísticas; None si no quedan criaturas
+        with self._constantes():
+            if self.motor is None:
+                resumen = self._paso_objetos()
+            else:
+                resumen = self.motor.resumen_frame(*self.motor.paso(self.perfil))
+        if resumen is None:
+            return None
+        self.frame_actual += 1
+        self.total_recursos_consumidos += resumen["consumidos"]
+
+        # Almacenar datos para gráficas
+        self.registro.agregar({
+            "frames": self.frame_actual,
+            "num_criaturas_vivas": resumen["num_criaturas"], # Asumiendo que no mueren
+            "num_recursos_disponibles": resumen["num_recursos"],
+            "recursos_consumidos_total": self.total_recursos_consumidos,
+            "estado_buscando": resumen["buscando"],
+            "estado_evadiendo": resumen["evadiendo"],
+            "estado_explorando": resumen["explorando"],
+            "dist_prom_peligro": resumen["dist_prom_peligro"],
+            "dist_prom_recurso_buscando": resumen["dist_prom_recurso_buscando"],
+        })
+        if self.grabador is not None:
+            self._grabar()
+        cada = self.p["FRAMES_POR_INSTANTANEA"]
+        if self.p["ARCHIVO_INSTANTANEA"] and cada and self.frame_actual % cada == 0:
+            self.guardar_instantanea(self.p["ARCHIVO_INSTANTANEA"])
+        self.perfil.marcar("estadisticas")
+        return resumen
+
+    def _paso_objetos(self):
+        perfil = self.perfil
+        recursos_consumidos_en_este_frame = [] # Se juntan al consumirse, para reponerlos sin recorrer el grupo
+
+        lista_peligros_actuales = list(self.peligros_grupo)
+        lista_criaturas_actuales = list(self.criaturas_grupo)
+
+        if not lista_criaturas_actuales: # Si todas las criaturas mueren (si se implementa)
+            return None
+
+        # Se reconstruye en el orden de la lista y se actualiza a medida que cada criatura se mueve
+        self.rejilla_criaturas.reconstruir(lista_criaturas_actuales)
+        perfil.marcar("percepcion")
+
+        for criatura in lista_criaturas_actuales:
+            recursos_consumidos_en_este_frame += criatura.update(
+                self.recursos_grupo, # Sólo se recorre entero si no hay rejilla
+                lista_peligros_actuales, 
+                lista_criaturas_actuales,
+                self.rejilla_criaturas,
+                self.recursos_grupo.rejilla,
+                self.campo_peligros,
+                perfil
+            )
+
+        # Estadísticas del frame: cada criatura ya dejó su estado (código entero) y las
+        # distancias que midió durante el paso; acá sólo se juntan y se reducen con arrays
+        n = len(lista_criaturas_actuales)
+        estados = np.fromiter((c.estado_actual for c in lista_criaturas_actuales), dtype=np.int8, count=n)
+        cuenta_estados = np.bincount(estados, minlength=len(ESTADOS))
+        dist_prom_peligro = np.nan
+        if lista_peligros_actuales:
+            dist_prom_peligro = np.fromiter((c.dist_min_peligro for c in lista_criaturas_actuales), dtype=float, count=n).mean()
+        dist_objetivo = np.fromiter((c.dist_objetivo for c in lista_criaturas_actuales), dtype=float, count=n)
+        dist_objetivo = dist_objetivo[~np.isnan(dist_objetivo)] # Sólo las que buscan un recurso disponible
+        dist_prom_recurso = dist_objetivo.mean() if dist_objetivo.size else np.nan
+        perfil.marcar("estadisticas")
+
+        # Reponer recursos consumidos: se liberan y el pool los reutiliza en otra posición
+        for r_consumido in recursos_consumidos_en_este_frame:
+            self.recursos.liberar(r_consumido)
+        for _ in recursos_consumidos_en_este_frame:
+            self.crear_nuevo_recurso()
+        perfil.contar("recursos_repuestos", len(recursos_consumidos_en_este_frame))
+        perfil.marcar("reposicion")
+
+        return {
+            "num_criaturas": len(self.criaturas),
+            "num_recursos": len(self.recursos),
+            "consumidos": len(recursos_consumidos_en_este_frame),
+            "buscando": int(cuenta_estados[ESTADO_BUSCANDO]),
+            "evadiendo": int(cuenta_estados[ESTADO_EVADIENDO]),
+            "explorando": int(cuenta_estados[ESTADO_EXPLORANDO]),
+            "dist_prom_peligro": dist_prom_peligro,
+            "dist_prom_recurso_buscando": dist_prom_recurso,
+        }
+
+    def estadisticas(self, con_volcados=True):
+        # Con con_volcados=False no se recargan los bloques ya volcados (quedan en
+        # DIRECTORIO_ESTADISTICAS): sólo las filas que seguían en memoria
+        cola = None if con_volcados else self.registro.estadisticas(con_volcados=False)
+        self.registro.volcar() # Si vuelca a disco, que el último bloque parcial también quede guardado
+        if self.grabador is not None:
+            self.grabador.volcar()
+        return self.registro.estadisticas() if cola is None else cola
+
+    def capas(self, camara=None):
+        # (color, radio, esquinas superiores izquierdas) de cada tipo de entidad, en orden
+        # de dibujo: recursos primero, luego peligros y las criaturas encima. Con una
+        # camara.Camara, sólo las entidades a la vista, en coordenadas de la ventana.
+        p = self.p
+        if camara is not None:
+            return self._capas_visibles(camara)
+        if self.motor is None:
+            grupos = (self.recursos_grupo, self.peligros_grupo, self.criaturas_grupo)
+            esquinas = [[agente.rect.topleft for agente in grupo] for grupo in grupos]
+        else:
+            motor = self.motor
+            posiciones = (motor.recursos_pos[motor.recursos_disponible], motor.peligros_pos, motor.pos)
+            radios = (p["RADIO_RECURSO"], p["RADIO_PELIGRO_VISUAL"], p["RADIO_CRIATURA"])
+            # Como rect.center = (int(x), int(y)) en los sprites
+            esquinas = [(pos.astype(int) - radio).tolist() for pos, radio in zip(posiciones, radios)]
+        return [(p["COLOR_RECURSO_RGB"], p["RADIO_RECURSO"], esquinas[0]),
+                (p["COLOR_PELIGRO_RGB"], p["RADIO_PELIGRO_VISUAL"], esquinas[1]),
+                (p["COLOR_CRIATURA_RGB"], p["RADIO_CRIATURA"], esquinas[2])]
+
+    def _capas_visibles(self, camara):
+        # Todo sale de consultas por rectángulo a índices espaciales: las rejillas de la
+        # simulación, un IndiceCeldas fijo para los peligros y, en los motores por arrays,
+        # el orden por celdas de las criaturas que el motor reutiliza para los vecinos del
+        # paso siguiente. El costo depende de lo que se ve; puede incluir algunas apenas
+        # fuera de la vista.
+        p = self.p
+        radios = (p["RADIO_RECURSO"], p["RADIO_PELIGRO_VISUAL"], p["RADIO_CRIATURA"])
+        rectangulo = camara.visible(margen=max(radios))
+        if self._indice_peligros is None:
+            self._indice_peligros = IndiceCeldas(self.campo_peligros.posiciones, p["ANCHO_PANTALLA"],
+                                                 p["ALTO_PANTALLA"], p["CELDA_DIBUJO"])
+        peligros = self._indice_peligros.en_rectangulo(*rectangulo)
+        if self.motor is None:
+            recursos = self.recursos_grupo.rejilla.en_rectangulo(*rectangulo)
+            criaturas = self.rejilla_criaturas.en_rectangulo(*rectangulo)
+            posiciones = ([tuple(agente.posicion) for agente in recursos], self.campo_peligros.posiciones[peligros],
+                          [tuple(agente.posicion) for agente in criaturas])
+        else:
+            motor = self.motor
+            posiciones = (motor.recursos_pos[motor.indice_recursos.en_rectangulo(*rectangulo)],
+                          motor.peligros_pos[peligros], motor.pos[motor.criaturas_en_rectangulo(*rectangulo)])
+        colores = (p["COLOR_RECURSO_RGB"], p["COLOR_PELIGRO_RGB"], p["COLOR_CRIATURA_RGB"])
+        capas = []
+        for color, radio, pos in zip(colores, radios, posiciones):
+            radio = camara.radio(radio)
+            capas.append((color, radio, (camara.a_pantalla(pos) - radio).tolist()))
+        return capas
+
+    def dibujar(self, pantalla, camara=None):
+        return dibujar_capas(pantalla, self.capas(camara))
+
+
+def _subconjunto(datos, prefijo):
+    return {nombre[len(prefijo):]: datos[nombre] for nombre in datos.files if nombre.startswith(prefijo)}
+
+def cargar_instantanea(ruta, cambios=None):
+    # Simulación restaurada desde guardar_instantanea; `cambios` se aplican sobre los
+    # parámetros guardados (p.ej. un MAX_FRAMES_SIMULACION mayor para seguir la corrida)
+    with np.load(ruta) as datos:
+        parametros = ast.literal_eval(str(datos["parametros"]))
+        parametros.update(cambios or {})
+        return Simulacion(parametros, instantanea=datos)
+
+def run_simulation(config=None, reanudar=None, perfil=None, en_vivo=None, con_volcados=True):
+    # Corrida sin ventana: no inicializa la pantalla, no crea superficies ni fuentes
+    # y no limita los FPS. config son cambios sobre parametros.py (mismos nombres).
+    # Con `reanudar` (ruta de una instantánea) sigue esa corrida y config se aplica
+    # sobre sus parámetros; con `perfil` (un perfil.Perfil) se miden las fases de
+    # cada frame; con `en_vivo` (N) una GraficaEnVivo se actualiza cada N frames.
+    # Devuelve las estadísticas por frame como arrays de NumPy (con con_volcados=False,
+    # sólo las que no se volcaron a DIRECTORIO_ESTADISTICAS; ver Simulacion.estadisticas).
+    sim = Simulacion(config) if reanudar is None else cargar_instantanea(reanudar, config)
+    if perfil is not None:
+        sim.perfil = perfil
+    grafica = GraficaEnVivo(sim.registro, en_vivo) if en_vivo else None
+    while sim.frame_actual < sim.p["MAX_FRAMES_SIMULACION"]:
+        sim.perfil.iniciar_frame()
+        if sim.paso() is None:
+            print(f"Frame {sim.frame_actual + 1}: No quedan criaturas. Terminando.")
+            break
+        sim.perfil.terminar_frame()
+    if grafica is not None:
+        grafica.cerrar()
+    if sim.p["ARCHIVO_INSTANTANEA"]:
+        sim.guardar_instantanea(sim.p["ARCHIVO_INSTANTANEA"])
+    return sim.estadisticas(con_volcados)
+
+
+# --- Bucle Principal con Ventana ---
+def ejecutar_con_ventana(sim):
+    pygame.init()
+    # La ventana muestra a lo sumo el mundo entero; si el mundo es más grande, se
+    # recorre con la cámara: flechas para moverla, rueda del mouse o +/- para el
+    # zoom, arrastrar con el botón izquierdo e Inicio para ver el mundo entero
+    ancho_mundo, alto_mundo = sim.p["ANCHO_PANTALLA"], sim.p["ALTO_PANTALLA"]
+    ancho_ventana, alto_ventana = min(sim.p["ANCHO_VENTANA"], ancho_mundo), min(sim.p["ALTO_VENTANA"], alto_mundo)
+    camara = Camara(ancho_ventana, alto_ventana, ancho_mundo, alto_mundo)
+    pantalla = pygame.display.set_mode((ancho_ventana, alto_ventana))
+    pygame.display.set_caption("Simulación ODD con Gráficas Detalladas")
+    reloj = pygame.time.Clock()
+    fuente_debug = pygame.font.Font(None, 22) 
+    fuente_frames = pygame.font.Font(None, 30)
+
+    ejecutando = True
+    mostrar_debug_info = True # Por defecto activado
+    mostrar_tiempos = False # Panel de tiempos por fase (tecla T)
+    renderizador = Renderizador(GRIS_CLARO)
+    max_frames = sim.p["MAX_FRAMES_SIMULACION"]
+    # Pasos de simulación por frame dibujado: teclas 1/2/3 (1x/10x/100x) y A (automático)
+    planificador = Planificador(sim.p["PASOS_POR_FRAME"], sim.p["FPS"])
+    teclas_velocidad = dict(zip((pygame.K_1, pygame.K_2, pygame.K_3), VELOCIDADES))
+    if not sim.perfil.activo:
+        sim.perfil = Perfil()
+    perfil = sim.perfil
+    paso_camara = 20 # Píxeles de pantalla por frame con una flecha apretada
+
+    print("Iniciando simulación Pygame...")
+
+    while ejecutando and sim.frame_actual < max_frames:
+        inicio_frame = time.perf_counter()
+        perfil.iniciar_frame()
+        for evento in pygame.event.get():
+            if evento.type == pygame.QUIT:
                 ejecutando = False
-    
-    if not ejecutando: break # Salir si el evento cambió la bandera
-
-    # --- Lógica de Actualización ---
-    lista_recursos_actuales = list(recursos_grupo)
-    lista_peligros_actuales = list(peligros_grupo)
-    lista_criaturas_actuales = list(criaturas_grupo)
-
-    if not lista_criaturas_actuales: # Si todas las criaturas mueren (si se implementa)
-        print(f"Frame {frame_actual}: No quedan criaturas. Terminando.")
-        ejecutando = False
-        break
-
-    for criatura in lista_criaturas_actuales:
-        consumidos_ahora, recurso_perseguido = criatura.update(
-            lista_recursos_actuales, 
-            lista_peligros_actuales, 
-            lista_criaturas_actuales
-        )
-        recursos_consumidos_en_este_frame += consumidos_ahora
-
-        # Recolectar estado
-        if criatura.estado_actual == "BUSCANDO":
-            count_buscando += 1
-            if recurso_perseguido and recurso_perseguido.disponible: # Solo si el recurso aún existe y está disponible
-                try:
-                    dist = criatura.posicion.distance_to(recurso_perseguido.posicion)
-                    distancias_a_recursos_buscando_frame.append(dist)
-                except AttributeError: # Si recurso_perseguido no tiene .posicion (ya no existe, etc.)
-                    pass # No añadir a la lista
-        elif criatura.estado_actual == "EVADIENDO":
-            count_evadiendo += 1
-        elif criatura.estado_actual == "EXPLORANDO":
-            count_explorando += 1
+            if evento.type == pygame.KEYDOWN:
+                if evento.key == pygame.K_r: 
+                    sim.agregar_recursos(5)
+                if evento.key == pygame.K_d: 
+                    mostrar_debug_info = not mostrar_debug_info
+                if evento.key == pygame.K_t:
+                    mostrar_tiempos = not mostrar_tiempos
+                if evento.key in teclas_velocidad:
+                    planificador.fijar(teclas_velocidad[evento.key])
+                if evento.key == pygame.K_a:
+                    planificador.alternar_automatico()
+                if evento.key in (pygame.K_PLUS, pygame.K_KP_PLUS, pygame.K_EQUALS):
+                    camara.acercar(1.25)
+                if evento.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    camara.acercar(0.8)
+                if evento.key == pygame.K_HOME:
+                    camara.ver_todo()
+                if evento.key == pygame.K_ESCAPE or evento.key == pygame.K_q: 
+                    ejecutando = False
+            if evento.type == pygame.MOUSEWHEEL:
+                camara.acercar(1.25 ** evento.y, pygame.mouse.get_pos())
+            if evento.type == pygame.MOUSEMOTION and evento.buttons[0]:
+                camara.mover(-evento.rel[0], -evento.rel[1])
+        teclas = pygame.key.get_pressed()
+        dx = (teclas[pygame.K_RIGHT] - teclas[pygame.K_LEFT]) * paso_camara
+        dy = (teclas[pygame.K_DOWN] - teclas[pygame.K_UP]) * paso_camara
+        if dx or dy:
+            camara.mover(dx, dy)
         
-        # Distancia al peligro más cercano
-        if lista_peligros_actuales:
-            dist_min_p = min(criatura.posicion.distance_to(p.posicion) for p in lista_peligros_actuales)
-            distancias_a_peligros_frame.append(dist_min_p)
-
-    # Reponer recursos consumidos
-    recursos_a_reponer = [r for r in recursos_grupo if not r.disponible]
-    for _ in recursos_a_reponer:
-        crear_nuevo_recurso()
-    for r_removido in recursos_a_reponer: # Eliminar después de iterar sobre ellos
-        r_removido.kill()
-    
-    total_recursos_consumidos_acumulado += recursos_consumidos_en_este_frame
-
-    # Almacenar datos para gráficas
-    datos_frames.append(frame_actual)
-    datos_num_criaturas_vivas.append(len(lista_criaturas_actuales)) # Asumiendo que no mueren
-    datos_num_recursos_disponibles.append(len(recursos_grupo))
-    datos_recursos_consumidos_total.append(total_recursos_consumidos_acumulado)
-    datos_estado_buscando.append(count_buscando)
-    datos_estado_evadiendo.append(count_evadiendo)
-    datos_estado_explorando.append(count_explorando)
-    
-    datos_dist_prom_peligro.append(np.mean(distancias_a_peligros_frame) if distancias_a_peligros_frame else np.nan)
-    datos_dist_prom_recurso_buscando.append(np.mean(distancias_a_recursos_buscando_frame) if distancias_a_recursos_buscando_frame else np.nan)
-
-    # --- Dibujo ---
-    pantalla.fill(GRIS_CLARO)
-    recursos_grupo.draw(pantalla) # Dibujar recursos primero
-    peligros_grupo.draw(pantalla)
-    criaturas_grupo.draw(pantalla) # Criaturas encima
-
-    # Info en pantalla
-    texto_frame_render = fuente_frames.render(f"Frame: {frame_actual}/{MAX_FRAMES_SIMULACION}", True, NEGRO)
-    pantalla.blit(texto_frame_render, (ANCHO_PANTALLA - texto_frame_render.get_width() - 10, 10))
-
-    if mostrar_debug_info:
-        info_text_lines = [
-            f"Criaturas: {len(lista_criaturas_actuales)}",
-            f"  Buscando: {count_buscando}",
-            f"  Evadiendo: {count_evadiendo}",
-            f"  Explorando: {count_explorando}",
-            f"Recursos Disp: {len(recursos_grupo)}",
-            f"Consumidos (Frame): {recursos_consumidos_en_este_frame}",
-            f"Consumidos (Total): {total_recursos_consumidos_acumulado}",
-            f"Dist. Prom. Peligro: {datos_dist_prom_peligro[-1]:.1f}" if datos_dist_prom_peligro and not np.isnan(datos_dist_prom_peligro[-1]) else "Dist. Prom. Peligro: N/A",
-            f"Dist. Prom. Recurso: {datos_dist_prom_recurso_buscando[-1]:.1f}" if datos_dist_prom_recurso_buscando and not np.isnan(datos_dist_prom_recurso_buscando[-1]) else "Dist. Prom. Recurso: N/A"
-        ]
-        for i, line in enumerate(info_text_lines):
-            pantalla.blit(fuente_debug.render(line, True, NEGRO), (10, 10 + i * 18))
-
-    pygame.display.flip()
-    reloj.tick(FPS)
-
-print("Bucle de Pygame finalizado.")
-pygame.quit()
-print("Pygame cerrado.")
+        if not ejecutando: break # Salir si el evento cambió la bandera
+        perfil.marcar("eventos")
+
+        # --- Lógica de Actualización (K pasos, cada uno con sus estadísticas) ---
+        resumen, pasos = planificador.avanzar(sim, max_frames)
+        if resumen is None:
+            print(f"Frame {sim.frame_actual + 1}: No quedan criaturas. Terminando.")
+            break
+
+        # --- Dibujo ---
+        # Info en pantalla (los textos que no cambiaron salen de la caché del renderizador)
+        texto_frame_render = renderizador.texto(fuente_frames, f"Frame: {sim.frame_actual}/{max_frames}  [{planificador.etiqueta()}]", NEGRO)
+        textos = [(texto_frame_render, (ancho_ventana - texto_frame_render.get_width() - 10, 10))]
+
+        if mostrar_debug_info:
+            dist_peligro = resumen["dist_prom_peligro"]
+            dist_recurso = resumen["dist_prom_recurso_buscando"]
+            info_text_lines = [
+                f"Criaturas: {resumen['num_criaturas']}",
+                f"  Buscando: {resumen['buscando']}",
+                f"  Evadiendo: {resumen['evadiendo']}",
+                f"  Explorando: {resumen['explorando']}",
+                f"Recursos Disp: {resumen['num_recursos']}",
+                f"Consumidos (Paso): {resumen['consumidos']}",
+                f"Consumidos (Total): {sim.total_recursos_consumidos}",
+                f"Dist. Prom. Peligro: {dist_peligro:.1f}" if not np.isnan(dist_peligro) else "Dist. Prom. Peligro: N/A",
+                f"Dist. Prom. Recurso: {dist_recurso:.1f}" if not np.isnan(dist_recurso) else "Dist. Prom. Recurso: N/A"
+            ]
+            for i, line in enumerate(info_text_lines):
+                textos.append((renderizador.texto(fuente_debug, line, NEGRO), (10, 10 + i * 18)))
+
+        if mostrar_tiempos and perfil.promedio_movil:
+            # Promedios móviles de los frames anteriores, al lado de la info de debug
+            promedio = perfil.promedio_movil
+            lineas_tiempos = [f"Frame: {promedio['total'] * 1000:.1f} ms ({1 / max(promedio['total'], 1e-9):.0f} FPS)"]
+            lineas_tiempos += [f"  {fase}: {promedio[fase] * 1000:.2f} ms" for fase in perfil.fases]
+            lineas_tiempos += [f"{nombre}: {promedio[nombre]:.0f}" for nombre in perfil.contadores]
+            for i, line in enumerate(lineas_tiempos):
+                textos.append((renderizador.texto(fuente_debug, line, NEGRO), (240, 10 + i * 18)))
+
+        # Entidades a la vista por lotes y, si se puede, sólo los rectángulos que cambiaron
+        sucios = renderizador.dibujar(pantalla, sim.capas(camara), textos)
+        perfil.marcar("dibujo")
+
+        if sucios is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(sucios)
+        perfil.marcar("pantalla")
+        planificador.terminar_frame(time.perf_counter() - inicio_frame, pasos)
+        reloj.tick(sim.p["FPS"])
+        perfil.marcar("espera")
+        perfil.terminar_frame()
+
+    print("Bucle de Pygame finalizado.")
+    pygame.quit()
+    print("Pygame cerrado.")
+
 
 # --- Generación de Gráficas ---
-if datos_frames and len(datos_frames) > 1 : # Necesitamos al menos 2 puntos para una línea
+def generar_graficas(estadisticas, archivo=None, puntos=2000):
+    # Con `archivo` guarda la figura (p.ej. Estadisticas_de_Comportamiento.png) sin abrir
+    # ninguna ventana ni bloquear; si no, la muestra. Cada serie se reduce a unos
+    # `puntos` puntos (LTTB, y promedios por tramo en la de estados apilados) para que
+    # las corridas largas se grafiquen igual de rápido.
+    datos_frames = estadisticas["frames"]
+    if len(datos_frames) <= 1: # Necesitamos al menos 2 puntos para una línea
+        print("No se recolectaron datos suficientes para graficar (simulación no corrió o muy pocos frames).")
+        return
+
     print("Generando gráficas de resultados...")
     
     try:
-        fig, axs = plt.subplots(2, 2, figsize=(15, 10), constrained_layout=True) # constrained_layout ayuda con superposiciones
+        if archivo:
+            from matplotlib.figure import Figure # Sin pyplot: no hace falta ninguna ventana
+            fig = Figure(figsize=(15, 10), constrained_layout=True)
+            axs = fig.subplots(2, 2)
+        else:
+            import matplotlib.pyplot as plt # Sólo se carga si realmente se grafica
+            fig, axs = plt.subplots(2, 2, figsize=(15, 10), constrained_layout=True) # constrained_layout ayuda con superposiciones
         fig.suptitle('Estadísticas de Comportamiento de la Simulación', fontsize=16)
+        # Con pocos puntos se marcan; con muchos, los marcadores sólo tapan la línea
+        marcador = dict(marker='.', markersize=2) if len(datos_frames) <= puntos else {}
 
         # Gráfica 1: Distribución de Estados
-        axs[0, 0].stackplot(datos_frames, 
-                            datos_estado_buscando, 
-                            datos_estado_evadiendo, 
-                            datos_estado_explorando, 
+        frames_estados, estados = promedio_por_tramos(datos_frames, [estadisticas["estado_buscando"],
+                                                                     estadisticas["estado_evadiendo"],
+                                                                     estadisticas["estado_explorando"]], puntos)
+        axs[0, 0].stackplot(frames_estados, *estados,
                             labels=['Buscando', 'Evadiendo', 'Explorando'],
                             colors=[COLOR_RECURSO_MPL, COLOR_PELIGRO_MPL, COLOR_EXPLORANDO_MPL],
                             alpha=0.8)
@@ -448,7 +865,7 @@ if datos_frames and len(datos_frames) > 1 : # Necesitamos al menos 2 puntos para
         axs[0, 0].set_xlim(min(datos_frames), max(datos_frames))
 
         # Gráfica 2: Distancia Promedio al Peligro
-        axs[0, 1].plot(datos_frames, datos_dist_prom_peligro, label='Dist. Prom. a Peligro', color='magenta', marker='.', markersize=2, linestyle='-')
+        axs[0, 1].plot(*lttb(datos_frames, estadisticas["dist_prom_peligro"], puntos), label='Dist. Prom. a Peligro', color='magenta', linestyle='-', **marcador)
         axs[0, 1].set_xlabel('Frame')
         axs[0, 1].set_ylabel('Distancia Promedio')
         axs[0, 1].set_title('Distancia Promedio al Peligro Más Cercano')
@@ -458,7 +875,7 @@ if datos_frames and len(datos_frames) > 1 : # Necesitamos al menos 2 puntos para
 
 
         # Gráfica 3: Distancia Promedio al Recurso (buscando)
-        axs[1, 0].plot(datos_frames, datos_dist_prom_recurso_buscando, label='Dist. Prom. a Recurso (buscando)', color='darkcyan', marker='.', markersize=2, linestyle='-')
+        axs[1, 0].plot(*lttb(datos_frames, estadisticas["dist_prom_recurso_buscando"], puntos), label='Dist. Prom. a Recurso (buscando)', color='darkcyan', linestyle='-', **marcador)
         axs[1, 0].set_xlabel('Frame')
         axs[1, 0].set_ylabel('Distancia Promedio')
         axs[1, 0].set_title('Eficiencia de Búsqueda (Dist. a Recurso)')
@@ -468,7 +885,7 @@ if datos_frames and len(datos_frames) > 1 : # Necesitamos al menos 2 puntos para
 
 
         # Gráfica 4: Total Recursos Consumidos
-        axs[1, 1].plot(datos_frames, datos_recursos_consumidos_total, label='Total Recursos Consumidos', color='darkorchid', linewidth=2)
+        axs[1, 1].plot(*lttb(datos_frames, estadisticas["recursos_consumidos_total"], puntos), label='Total Recursos Consumidos', color='darkorchid', linewidth=2)
         axs[1, 1].set_xlabel('Frame')
         axs[1, 1].set_ylabel('Cantidad Acumulada')
         axs[1, 1].set_title('Recursos Consumidos (Acumulado)')
@@ -476,15 +893,103 @@ if datos_frames and len(datos_frames) > 1 : # Necesitamos al menos 2 puntos para
         axs[1, 1].grid(True, linestyle=':', alpha=0.7)
         axs[1, 1].set_xlim(min(datos_frames), max(datos_frames))
 
-        print("Mostrando gráficas...")
-        plt.show()
-        print("Ventana de gráficas cerrada.")
+        if archivo:
+            fig.savefig(archivo, dpi=100)
+            print(f"Gráficas guardadas en {archivo}")
+        else:
+            print("Mostrando gráficas...")
+            plt.show()
+            print("Ventana de gráficas cerrada.")
 
     except Exception as e_graph:
         print(f"ERROR al generar o mostrar las gráficas: {e_graph}")
         import traceback
         traceback.print_exc()
-else:
-    print("No se recolectaron datos suficientes para graficar (simulación no corrió o muy pocos frames).")
 
-print("Script Python finalizado.")
\ No newline at end of file
+
+# --- Línea de Comandos ---
+def _leer_parametro(texto):
+    nombre, _, valor = texto.partition("=")
+    try:
+        valor = ast.literal_eval(valor)
+    except (ValueError, SyntaxError):
+        pass # Se deja como texto (p.ej. --param MOTOR=vectorizado)
+    return nombre.strip(), valor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulación por agentes: criaturas buscadoras de recursos y evasoras de peligro.")
+    parser.add_argument("--sin-ventana", action="store_true",
+                        help="corre sin pantalla ni límite de FPS y no muestra gráficas")
+    parser.add_argument("--motor", choices=("objetos", "vectorizado", "paralelo"), help="motor de simulación (por defecto MOTOR)")
+    parser.add_argument("--frames", type=int, help="número de frames (por defecto MAX_FRAMES_SIMULACION)")
+    parser.add_argument("--semilla", type=int, help="semilla para reproducir una corrida (por defecto SEMILLA)")
+    parser.add_argument("--param", action="append", default=[], type=_leer_parametro, metavar="NOMBRE=VALOR",
+                        help="cambia una constante de parametros.py; se puede repetir")
+    parser.add_argument("--salida", help="guarda las estadísticas por frame en este archivo .npz")
+    parser.add_argument("--instantanea", metavar="RUTA",
+                        help="guarda el estado completo en RUTA al terminar (y cada --cada frames)")
+    parser.add_argument("--cada", type=int, metavar="N", help="frames entre instantáneas")
+    parser.add_argument("--reanudar", metavar="RUTA", help="sigue la corrida guardada en esta instantánea")
+    parser.add_argument("--tiempos", metavar="RUTA",
+                        help="mide cada fase del frame y guarda los tiempos y contadores en RUTA (.csv o .npz)")
+    parser.add_argument("--trayectoria", metavar="DIRECTORIO",
+                        help="graba posiciones, velocidades y estados de cada frame en DIRECTORIO")
+    parser.add_argument("--reproducir", metavar="DIRECTORIO", help="abre el visor de una trayectoria grabada (no simula)")
+    parser.add_argument("--graficas", metavar="ARCHIVO",
+                        help="guarda las gráficas finales en ARCHIVO (.png, .svg, .pdf) en vez de mostrarlas")
+    parser.add_argument("--grafica-en-vivo", type=int, nargs="?", const=30, metavar="N",
+                        help="abre una gráfica que se actualiza durante la corrida cada N frames (por defecto 30)")
+    parser.add_argument("--puntos-grafica", type=int, default=2000, metavar="N",
+                        help="puntos por serie en las gráficas finales (las series largas se reducen)")
+    args = parser.parse_args(argv)
+
+    if args.reproducir:
+        from trayectorias import reproducir
+        reproducir(args.reproducir)
+        return
+
+    config = dict(args.param)
+    if args.motor: config["MOTOR"] = args.motor
+    if args.frames is not None: config["MAX_FRAMES_SIMULACION"] = args.frames
+    if args.semilla is not None: config["SEMILLA"] = args.semilla
+    if args.instantanea: config["ARCHIVO_INSTANTANEA"] = args.instantanea
+    if args.cada is not None: config["FRAMES_POR_INSTANTANEA"] = args.cada
+    if args.trayectoria: config["DIRECTORIO_TRAYECTORIA"] = args.trayectoria
+
+    perfil = Perfil() if args.tiempos else None
+    if args.sin_ventana:
+        # Si no se guardan ni grafican, no hace falta juntar los bloques volcados a disco
+        estadisticas = run_simulation(config, reanudar=args.reanudar, perfil=perfil, en_vivo=args.grafica_en_vivo,
+                                      con_volcados=bool(args.salida or args.graficas))
+        ultimos = len(estadisticas["frames"])
+        frames = estadisticas["frames"][-1] if ultimos else 0
+        total = estadisticas["recursos_consumidos_total"][-1] if ultimos else 0
+        print(f"Simulación sin ventana terminada: {frames} frames, {total} recursos consumidos.")
+    else:
+        sim = Simulacion(config) if args.reanudar is None else cargar_instantanea(args.reanudar, config)
+        if perfil is not None:
+            sim.perfil = perfil
+        grafica = GraficaEnVivo(sim.registro, args.grafica_en_vivo) if args.grafica_en_vivo else None
+        ejecutar_con_ventana(sim)
+        if grafica is not None:
+            grafica.cerrar()
+        perfil = sim.perfil
+        if sim.p["ARCHIVO_INSTANTANEA"]:
+            sim.guardar_instantanea(sim.p["ARCHIVO_INSTANTANEA"])
+        estadisticas = sim.estadisticas()
+    if args.salida:
+        np.savez(args.salida, **estadisticas)
+        print(f"Estadísticas guardadas en {args.salida}")
+    if args.tiempos:
+        perfil.exportar(args.tiempos)
+        print(f"Tiempos por fase guardados en {args.tiempos}")
+    if args.graficas:
+        generar_graficas(estadisticas, args.graficas, args.puntos_grafica)
+    elif not args.sin_ventana:
+        generar_graficas(estadisticas, puntos=args.puntos_grafica)
+
+    print("Script Python finalizado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import math
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from campo_peligros import CampoPeligros
+from motor_vectorizado import MotorVectorizado
+from perfil import CONTADORES, SIN_PERFIL
+from rejilla_espacial import RejillaCubetas
+
+# --- Motor vectorizado en varios procesos ---
+# El mundo se divide en teselas (una rejilla de columnas x filas) y cada paso se
+# reparte entre procesos trabajadores, una tarea por tesela. Las posiciones y
+# velocidades viven siempre en memoria compartida (self.pos y self.vel son vistas de
+# esos bloques), los peligros y los candidatos de su campo (calculado una vez, en el
+# proceso principal) se publican una sola vez y los recursos con su índice sólo
+# cuando cambiaron; cada trabajador lee de ahí lo que necesita y escribe sus
+# resultados en arrays de salida también compartidos, sólo en las filas de sus
+# criaturas.
+#
+# Una criatura pertenece a la tesela que contiene su posición; las teselas del borde
+# se extienden hasta el infinito, así que las criaturas que salen un poco del mundo
+# antes de dar la vuelta siguen teniendo dueña. Cada tarea ve además las criaturas
+# de un borde fantasma del ancho del mayor radio de vecindad, que es todo lo que
+# hace falta para separar y cohesionar. Una vez por paso el proceso principal ordena
+# las criaturas por tesela (las propias y detrás las fantasmas de cada una), así que
+# cada tarea recibe un tramo contiguo de ese orden y no recorre a toda la población.
+# Igual que en el motor secuencial, las distancias no atraviesan el borde del mundo:
+# el único efecto del toro es la vuelta que da mantener_en_pantalla, que se hace en
+# el proceso principal. Los recursos y los peligros se consultan en el índice
+# global, no por tesela, así que el consumo se reparte en tramos de índices.
+#
+# Lo que usa el generador aleatorio (la exploración) y lo que cambia el mundo
+# (mover, marcar consumidos, reponer) se hace en el proceso principal en el mismo
+# orden que MotorVectorizado: con la misma semilla se sortean los mismos números.
+# Un recurso al alcance de criaturas de varias teselas se marca una sola vez y se
+# consume una sola vez, como en el motor secuencial. Las fuerzas coinciden con las
+# de MotorVectorizado salvo por el orden de las sumas de vecinos (diferencias de
+# redondeo), así que las trayectorias coinciden paso a paso, no a largo plazo.
+
+
+def _cuadricula(teselas, ancho, alto):
+    # Columnas x filas con teselas lo más cuadradas posible
+    columnas = max(1, min(teselas, round(math.sqrt(teselas * ancho / alto))))
+    return columnas, math.ceil(teselas / columnas)
+
+def bordes_teselas(teselas, ancho, alto):
+    # Bordes interiores de las columnas y de las filas; las teselas de los bordes
+    # del mundo llegan hasta +-infinito
+    columnas, filas = _cuadricula(teselas, ancho, alto)
+    return np.linspace(0, ancho, columnas + 1)[1:-1], np.linspace(0, alto, filas + 1)[1:-1]
+
+def _rango(bordes, v, margen):
+    # Tesela de cada valor en un eje y las primeras y últimas cuyo intervalo
+    # ensanchado en `margen` ([x0 - margen, x1 + margen)) lo contiene. Son pocos
+    # bordes: contar los que quedan atrás es más rápido que searchsorted.
+    tesela, primera, ultima = (np.zeros(len(v), dtype=np.intp) for _ in range(3))
+    for borde in bordes:
+        tesela += v >= borde
+        primera += v >= borde + margen
+        ultima += v >= borde - margen
+    return tesela, primera, ultima
+
+def ordenar_por_tesela(pos, bordes_x, bordes_y, margen):
+    # Índices de las criaturas tesela por tesela: primero las propias y luego las de
+    # su borde fantasma, cada grupo en orden de índice. Devuelve ese orden y, por
+    # tesela, su tramo (inicio, fin de las propias, fin de las fantasmas) en él.
+    columnas = len(bordes_x) + 1
+    teselas = columnas * (len(bordes_y) + 1)
+    columna, c0, c1 = _rango(bordes_x, pos[:, 0], margen)
+    fila, f0, f1 = _rango(bordes_y, pos[:, 1], margen)
+    propia = fila * columnas + columna
+    # Con claves de 8 o 16 bits el orden estable es un radix sort
+    propias = np.argsort(propia.astype(np.min_scalar_type(teselas)), kind="stable")
+    cuenta_propias = np.bincount(propia, minlength=teselas)
+
+    # Fantasmas: sólo de las criaturas cuyo intervalo ensanchado toca más de una tesela
+    borde = np.flatnonzero((c1 > c0) | (f1 > f0))
+    indices, destinos = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+    for dc in range(int((c1 - c0)[borde].max(initial=0)) + 1):
+        for df in range(int((f1 - f0)[borde].max(initial=0)) + 1):
+            i = borde[(c0[borde] + dc <= c1[borde]) & (f0[borde] + df <= f1[borde])]
+            tesela = (f0[i] + df) * columnas + c0[i] + dc
+            otra = tesela != propia[i]
+            indices.append(i[otra])
+            destinos.append(tesela[otra])
+    indices, destinos = np.concatenate(indices), np.concatenate(destinos)
+    fantasmas = indices[np.lexsort((indices, destinos))]
+    cuenta_fantasmas = np.bincount(destinos, minlength=teselas)
+
+    piezas, tramos, inicio = [], [], 0
+    for suyas, vecinas in zip(np.split(propias, np.cumsum(cuenta_propias)[:-1]),
+                              np.split(fantasmas, np.cumsum(cuenta_fantasmas)[:-1])):
+        piezas += [suyas, vecinas]
+        tramos.append((inicio, inicio + len(suyas), inicio + len(suyas) + len(vecinas)))
+        inicio = tramos[-1][2]
+    return np.concatenate(piezas), tramos
+
+
+_retenidos = [] # Bloques ya borrados que no se pudieron cerrar porque quedaban vistas
+
+def _soltar(bloque):
+    bloque.unlink()
+    _retenidos.append(bloque)
+    for retenido in list(_retenidos):
+        try:
+            retenido.close()
+            _retenidos.remove(retenido)
+        except BufferError:
+            pass
+
+
+class MemoriaCompartida:
+    # Arrays con nombre en bloques de memoria compartida. Un bloque se reutiliza
+    # mientras alcance y se reemplaza por uno del doble cuando no; los trabajadores
+    # los abren a partir del descriptor (nombre del bloque, forma, dtype).
+    def __init__(self):
+        self.bloques = {}
+
+    def reservar(self, nombre, forma, dtype):
+        dtype = np.dtype(dtype)
+        tamanio = max(1, int(np.prod(forma)) * dtype.itemsize)
+        bloque = self.bloques.get(nombre)
+        if bloque is None or bloque.size < tamanio:
+            if bloque is not None:
+                _soltar(bloque)
+            tamanio = tamanio if bloque is None else max(tamanio, 2 * bloque.size)
+            bloque = self.bloques[nombre] = shared_memory.SharedMemory(create=True, size=tamanio)
+        # frombuffer retiene el bloque: no se puede cerrar mientras quede una vista viva
+        vista = np.frombuffer(bloque.buf, dtype, int(np.prod(forma))).reshape(forma)
+        return (bloque.name, tuple(forma), dtype.str), vista
+
+    def publicar(self, nombre, array):
+        descriptor, vista = self.reservar(nombre, array.shape, array.dtype)
+        vista[...] = array
+        return descriptor
+
+    def liberar(self):
+        for bloque in self.bloques.values():
+            _soltar(bloque)
+        self.bloques.clear()
+
+
+# --- Lado de los trabajadores ---
+_parametros = None
+_abiertos = {} # Bloques abiertos por cada trabajador, por nombre de array
+_campo = {} # Campo de peligros del trabajador, por los bloques de sus arrays
+
+def _iniciar_trabajador(parametros):
+    global _parametros
+    _parametros = parametros
+
+def _abrir(descriptores):
+    arrays = {}
+    for nombre, (bloque, forma, dtype) in descriptores.items():
+        abierto = _abiertos.get(nombre)
+        if abierto is None or abierto.name != bloque:
+            if abierto is not None:
+                abierto.close()
+            abierto = _abiertos[nombre] = shared_memory.SharedMemory(name=bloque)
+        arrays[nombre] = np.ndarray(forma, dtype, buffer=abierto.buf)
+    return arrays
+
+class _Contador:
+    # Cuenta como un Perfil (para sumarlo en el proceso principal) pero no mide tiempos
+    def __init__(self):
+        self.cuentas = dict.fromkeys(CONTADORES, 0)
+
+    def marcar(self, fase):
+        pass
+
+    def contar(self, nombre, cantidad=1):
+        self.cuentas[nombre] += cantidad
+
+def _indice(p, a):
+    indice = RejillaCubetas(p["ANCHO_PANTALLA"], p["ALTO_PANTALLA"], p["RADIO_VISION_RECURSO_CRIATURA"] / 2)
+    for nombre in ("cubetas", "ocupacion", "celda_de", "hueco_de", "pos"):
+        setattr(indice, nombre, a[f"indice/{nombre}"])
+    return indice
+
+def _campo_peligros(p, a, descriptores):
+    # El campo lo calcula el proceso principal; cada trabajador arma uno vacío con la
+    # misma rejilla y le pone los candidatos compartidos (sólo cuando cambian los bloques)
+    clave = (descriptores["campo/inicio"], descriptores["campo/ids"])
+    if clave not in _campo:
+        _campo.clear()
+        campo = CampoPeligros(np.empty((0, 2)), p["ANCHO_PANTALLA"], p["ALTO_PANTALLA"],
+                              p["RADIO_VISION_PELIGRO_CRIATURA"], p["RADIO_PELIGRO_VISUAL"] * 2,
+                              p["CELDA_CAMPO_PELIGROS"], p["RADIO_CRIATURA"] + p["VELOCIDAD_MAX_CRIATURA"] + 1)
+        campo.posiciones, campo.inicio, campo.ids = a["peligros_pos"], a["campo/inicio"], a["campo/ids"]
+        _campo[clave] = campo
+    return _campo[clave]
+
+def _tarea_fuerzas(descriptores, tramo):
+    # Fuerzas de las criaturas de la tesela, con el MotorVectorizado aplicado a ellas
+    # más las del borde fantasma (ésas sólo sirven de vecinas y se descartan)
+    p = _parametros
+    a = _abrir(descriptores)
+    inicio, medio, fin = tramo
+    locales = a["orden"][inicio:fin]
+    propias = locales[:medio - inicio]
+
+    vista = MotorVectorizado.__new__(MotorVectorizado)
+    vista.p = p
+    vista.pos = a["pos"][locales]
+    vista.vel = a["vel"][locales]
+    vista.peligros_pos = a["peligros_pos"]
+    vista.campo_peligros = _campo_peligros(p, a, descriptores)
+    vista.recursos_pos = a["recursos_pos"]
+    vista.indice_recursos = _indice(p, a)
+    vista.pos_medida = None
+    vista._orden_criaturas = None
+    contador = _Contador()
+    fuerza, separacion, estado, objetivo, peso_exploracion = vista.calcular_fuerzas(contador)
+    k = len(propias)
+    a["fuerza"][propias] = fuerza[:k]
+    a["separacion"][propias] = separacion[:k]
+    a["estado"][propias] = estado[:k]
+    a["objetivo"][propias] = objetivo[:k]
+    a["peso_exploracion"][propias] = peso_exploracion[:k]
+    return contador.cuentas
+
+def _tarea_consumo(descriptores, tramo):
+    # Recursos al alcance de las criaturas inicio..fin-1 y distancia al peligro más cercano
+    p = _parametros
+    a = _abrir(descriptores)
+    inicio, fin = tramo
+    pos = a["pos"][inicio:fin]
+    contador = _Contador()
+    _, k, _, comparados = _indice(p, a).pares(pos, p["UMBRAL_CONSUMO_RECURSO"], candidatos=True)
+    contador.contar("distancias", comparados)
+    a["al_alcance"][k] = True # Varias teselas pueden marcar el mismo recurso: se consume una vez
+
+    peligros = a["peligros_pos"]
+    i, k = _campo_peligros(p, a, descriptores).candidatos(pos)
+    diferencia = pos[i] - peligros[k]
+    dist = np.sqrt(np.einsum('ij,ij->i', diferencia, diferencia))
+    contador.contar("distancias", dist.size)
+    dist_min = np.full(len(pos), np.inf)
+    np.minimum.at(dist_min, i, dist)
+    a["dist_min_peligro"][inicio:fin] = dist_min
+    return contador.cuentas
+
+
+# --- Lado del proceso principal ---
+def _cerrar(pool, memoria):
+    pool.shutdown(wait=True, cancel_futures=True)
+    memoria.liberar()
+
+class MotorParalelo(MotorVectorizado):
+    # MotorVectorizado con la percepción y el consumo repartidos por teselas entre
+    # PROCESOS trabajadores (0 = uno por núcleo) y TESELAS teselas (0 = una por proceso)
+    def __init__(self, parametros=None, semilla=None, instantanea=None):
+        self.memoria = MemoriaCompartida()
+        self._compartidos = {} # Descriptores de los arrays que ya están en memoria compartida
+        self._vistas = {}
+        super().__init__(parametros, semilla, instantanea)
+        self.procesos = self.p["PROCESOS"] or os.cpu_count() or 1
+        self.teselas = self.p["TESELAS"] or self.procesos
+        self.bordes = bordes_teselas(self.teselas, self.ancho, self.alto)
+        self.radio_fantasma = max(self.p["DISTANCIA_SEPARACION_CRIATURA"], self.p["RADIO_VISION_OTRA_CRIATURA"])
+        self.pool = ProcessPoolExecutor(self.procesos, initializer=_iniciar_trabajador, initargs=(self.p,))
+        # Libera los procesos y la memoria compartida cuando el motor deja de usarse
+        self._finalizador = weakref.finalize(self, _cerrar, self.pool, self.memoria)
+
+    def cerrar(self):
+        # Las criaturas vuelven a arrays propios antes de liberar la memoria compartida
+        self.pos, self.vel = self.pos.copy(), self.vel.copy()
+        self._vistas.clear()
+        self._finalizador()
+
+    # --- Memoria compartida ---
+    def _compartir(self, nombre):
+        # Mueve el array a memoria compartida y deja en el atributo una vista de él.
+        # pos y vel sólo cambian en su lugar, así que después no hay que republicarlas.
+        array = getattr(self, nombre)
+        if self._vistas.get(nombre) is not array:
+            self._compartidos[nombre], vista = self.memoria.reservar(nombre, array.shape, array.dtype)
+            vista[...] = array
+            setattr(self, nombre, vista)
+            self._vistas[nombre] = vista
+        return self._compartidos[nombre]
+
+    def _publicar_recursos(self):
+        # Los recursos y su índice se copian sólo si cambiaron desde la última vez
+        if "recursos_pos" not in self._compartidos:
+            self._compartidos["recursos_pos"] = self.memoria.publicar("recursos_pos", self.recursos_pos)
+            indice = self.indice_recursos
+            for nombre in ("cubetas", "ocupacion", "celda_de", "hueco_de", "pos"):
+                self._compartidos[f"indice/{nombre}"] = self.memoria.publicar(f"indice/{nombre}",
+                                                                            getattr(indice, nombre))
+
+    def _descriptores(self):
+        self._compartir("pos")
+        self._compartir("vel")
+        self._publicar_recursos()
+        if "peligros_pos" not in self._compartidos:
+            # Los peligros no cambian: ellos y los candidatos de su campo se publican una vez
+            self._compartidos["peligros_pos"] = self.memoria.publicar("peligros_pos", self.peligros_pos)
+            for nombre in ("inicio", "ids"):
+                self._compartidos[f"campo/{nombre}"] = self.memoria.publicar(f"campo/{nombre}",
+                                                                           getattr(self.campo_peligros, nombre))
+        return dict(self._compartidos)
+
+    def _recursos_cambiaron(self):
+        self._compartidos.pop("recursos_pos", None)
+
+    def _restaurar(self, datos):
+        super()._restaurar(datos)
+        self._compartidos.pop("peligros_pos", None)
+        self._recursos_cambiaron()
+
+    def agregar_recursos(self, k):
+        super().agregar_recursos(k)
+        self._recursos_cambiaron()
+
+    def reponer_recursos(self):
+        repuestos = super().reponer_recursos()
+        if repuestos:
+            self._recursos_cambiaron()
+        return repuestos
+
+    def _marcar_consumidos(self, consumidos):
+        if consumidos.size:
+            self._recursos_cambiaron()
+        return super()._marcar_consumidos(consumidos)
+
+    def _salida(self, descriptores, nombre, forma, dtype, valor=None):
+        # Sin `valor`, las tareas escriben todas las filas y no hace falta inicializarla
+        descriptores[nombre], vista = self.memoria.reservar(nombre, forma, dtype)
+        if valor is not None:
+            vista[...] = valor
+        return vista
+
+    def _repartir(self, tarea, descriptores, tramos, perfil):
+        futuros = [self.pool.submit(tarea, descriptores, tramo) for tramo in tramos]
+        for futuro in futuros:
+            for nombre, cantidad in futuro.result().items():
+                if cantidad:
+                    perfil.contar(nombre, cantidad)
+
+    # --- Fases repartidas ---
+    def calcular_fuerzas(self, perfil=SIN_PERFIL):
+        n = len(self.pos)
+        descriptores = self._descriptores()
+        orden, tramos = ordenar_por_tesela(self.pos, *self.bordes, self.radio_fantasma)
+        descriptores["orden"] = self.memoria.publicar("orden", orden)
+        salidas = [self._salida(descriptores, "fuerza", (n, 2), float),
+                   self._salida(descriptores, "separacion", (n, 2), float),
+                   self._salida(descriptores, "estado", (n,), np.int8),
+                   self._salida(descriptores, "objetivo", (n,), np.intp),
+                   self._salida(descriptores, "peso_exploracion", (n,), float)]
+        self._repartir(_tarea_fuerzas, descriptores, tramos, perfil)
+        perfil.marcar("percepcion")
+        return tuple(salida.copy() for salida in salidas)
+
+    def consumir(self, perfil=SIN_PERFIL):
+        # También mide la distancia al peligro más cercano desde las posiciones nuevas
+        # (lo que el motor secuencial hace en medir_peligros al final del paso)
+        descriptores = self._descriptores()
+        al_alcance = self._salida(descriptores, "al_alcance", (len(self.recursos_pos),), bool, False)
+        dist_min = self._salida(descriptores, "dist_min_peligro", (len(self.pos),), float)
+        cortes = np.linspace(0, len(self.pos), self.teselas + 1).astype(np.intp).tolist()
+        self._repartir(_tarea_consumo, descriptores, list(zip(cortes[:-1], cortes[1:])), perfil)
+        self.dist_min_peligro = dist_min.copy()
+        self.pos_medida = self.pos.copy()
+        self.peligros_a_la_vista = None # Los trabajadores miden los peligros a la vista al calcular fuerzas
+        return self._marcar_consumidos(np.flatnonzero(al_alcance & self.recursos_disponible))
+
+    def medir_peligros(self, perfil=SIN_PERFIL):
+        if self.pos_medida is None or not np.array_equal(self.pos_medida, self.pos):
+            super().medir_peligros(perfil)
@@ -0,0 +1,364 @@
+import ast
+
+import numpy as np
+
+from parametros import ESTADO_BUSCANDO, ESTADO_EVADIENDO, ESTADO_EXPLORANDO, ESTADOS, resolver_parametros
+from campo_peligros import CampoPeligros
+from perfil import SIN_PERFIL
+from rejilla_espacial import OrdenCeldas, RejillaCubetas, pares_cercanos
+
+
+# --- Operaciones vectoriales por lotes (una fila por criatura) ---
+def _normas(v):
+    return np.sqrt(np.einsum('ij,ij->i', v, v))
+
+def limitar_fuerza(fuerza, max_fuerza):
+    # Equivalente por lotes de Criatura.limitar_fuerza (modifica en el sitio)
+    normas = _normas(fuerza)
+    exceso = normas > max_fuerza
+    fuerza[exceso] *= (max_fuerza / normas[exceso])[:, None]
+    return fuerza
+
+def escalar_a_longitud(v, longitud):
+    # Como Vector2.scale_to_length, pero las filas nulas se quedan en cero
+    normas = _normas(v)
+    resultado = np.zeros_like(v)
+    no_nulos = normas > 0
+    resultado[no_nulos] = v[no_nulos] * (longitud / normas[no_nulos])[:, None]
+    return resultado, no_nulos
+
+def calcular_direccion_deseada(deseo, velocidad, velocidad_max, fuerza_max):
+    # deseo = objetivo - posicion (o al revés si es alejarse); filas nulas dan fuerza nula
+    deseada, no_nulos = escalar_a_longitud(deseo, velocidad_max)
+    fuerza = np.where(no_nulos[:, None], deseada - velocidad, 0.0)
+    return limitar_fuerza(fuerza, fuerza_max)
+
+def _sumar_por_indice(indices, valores, n):
+    suma = np.zeros((n, 2))
+    suma[:, 0] = np.bincount(indices, weights=valores[:, 0], minlength=n)
+    suma[:, 1] = np.bincount(indices, weights=valores[:, 1], minlength=n)
+    return suma
+
+class MotorVectorizado:
+    # Mismo modelo que Criatura, pero con toda la población guardada en arrays
+    # (estructura de arrays) y las fuerzas calculadas para todas a la vez.
+    # Las criaturas se actualizan a partir del estado del frame anterior (no una
+    # tras otra como en el bucle de sprites), así que las trayectorias sólo
+    # coinciden con las de Criatura paso a paso, no frame a frame.
+    def __init__(self, parametros=None, semilla=None, instantanea=None):
+        self.p = resolver_parametros(parametros)
+        self.rng = np.random.default_rng(semilla)
+        p = self.p
+        self.ancho = p["ANCHO_PANTALLA"]
+        self.alto = p["ALTO_PANTALLA"]
+        # Sólo contiene los recursos disponibles; se actualiza al consumir y al reponer
+        self.indice_recursos = RejillaCubetas(self.ancho, self.alto, p["RADIO_VISION_RECURSO_CRIATURA"] / 2)
+        # Lo que midió medir_peligros desde pos_medida
+        self.pos_medida = None
+        self.peligros_a_la_vista = None
+        self.dist_min_peligro = None
+        # OrdenCeldas de las posiciones actuales (se arma al usarlo y se descarta al mover)
+        self._orden_criaturas = None
+        if instantanea is not None:
+            self._restaurar(instantanea)
+            return
+
+        n = p["NUM_CRIATURAS_INICIALES"]
+        self.pos = np.column_stack([self.rng.integers(0, self.ancho, n),
+                                    self.rng.integers(0, self.alto, n)]).astype(float)
+        self.vel, no_nulos = escalar_a_longitud(self.rng.uniform(-1, 1, (n, 2)), p["VELOCIDAD_MAX_CRIATURA"])
+        if not no_nulos.all():
+            signos = self.rng.choice([-1.0, 1.0], size=(n, 2))
+            self.vel[~no_nulos] = escalar_a_longitud(signos[~no_nulos], p["VELOCIDAD_MAX_CRIATURA"])[0]
+        self.estado = np.full(n, ESTADO_EXPLORANDO, dtype=np.int8)
+        self.objetivo = np.full(n, -1, dtype=np.intp)
+
+        # Peligros primero para que los recursos no caigan encima fácilmente
+        peligros = []
+        for i in range(p["NUM_PELIGROS"]):
+            if i == 0: x, y = self.ancho * 0.25, self.alto * 0.25
+            elif i == 1: x, y = self.ancho * 0.75, self.alto * 0.75
+            else:
+                x = self.rng.integers(p["RADIO_PELIGRO_VISUAL"], self.ancho - p["RADIO_PELIGRO_VISUAL"])
+                y = self.rng.integers(p["RADIO_PELIGRO_VISUAL"], self.alto - p["RADIO_PELIGRO_VISUAL"])
+            peligros.append((x, y))
+        self.peligros_pos = np.array(peligros, dtype=float).reshape(-1, 2)
+        self._crear_campo_peligros()
+
+        self.recursos_pos = np.empty((0, 2))
+        self.recursos_disponible = np.empty(0, dtype=bool)
+        self.ultimo_consumo = np.empty(0, dtype=bool)
+        self.agregar_recursos(p["NUM_RECURSOS_INICIALES"])
+
+    # --- Instantáneas ---
+    def instantanea(self):
+        # Arrays con todo el estado, incluido el generador y el índice de recursos
+        # (el orden de sus cubetas decide los empates, así que se guarda tal cual)
+        indice = self.indice_recursos
+        return {
+            "pos": self.pos, "vel": self.vel, "estado": self.estado, "objetivo": self.objetivo,
+            "peligros_pos": self.peligros_pos,
+            "recursos_pos": self.recursos_pos, "recursos_disponible": self.recursos_disponible,
+            "ultimo_consumo": self.ultimo_consumo,
+            "indice/cubetas": indice.cubetas, "indice/ocupacion": indice.ocupacion,
+            "indice/celda_de": indice.celda_de, "indice/hueco_de": indice.hueco_de, "indice/pos": indice.pos,
+            "rng": np.array(repr(self.rng.bit_generator.state)),
+        }
+
+    def _restaurar(self, datos):
+        for nombre in ("pos", "vel", "estado", "objetivo", "peligros_pos",
+                       "recursos_pos", "recursos_disponible", "ultimo_consumo"):
+            setattr(self, nombre, np.array(datos[nombre]))
+        for nombre in ("cubetas", "ocupacion", "celda_de", "hueco_de", "pos"):
+            setattr(self.indice_recursos, nombre, np.array(datos[f"indice/{nombre}"]))
+        self.rng.bit_generator.state = ast.literal_eval(str(datos["rng"]))
+        self._crear_campo_peligros()
+
+    def _crear_campo_peligros(self):
+        p = self.p
+        self.campo_peligros = CampoPeligros(self.peligros_pos, self.ancho, self.alto, p["RADIO_VISION_PELIGRO_CRIATURA"],
+                                            p["RADIO_PELIGRO_VISUAL"] * 2, p["CELDA_CAMPO_PELIGROS"],
+                                            p["RADIO_CRIATURA"] + p["VELOCIDAD_MAX_CRIATURA"] + 1)
+
+    # --- Recursos ---
+    def _posiciones_recurso(self, k):
+        # Igual que crear_nuevo_recurso: hasta 10 intentos lejos de los peligros, luego en cualquier lado
+        margen = self.p["RADIO_RECURSO"]
+        def sortear(m):
+            return np.column_stack([self.rng.integers(margen, self.ancho - margen, m),
+                                    self.rng.integers(margen, self.alto - margen, m)]).astype(float)
+        posiciones = np.empty((k, 2))
+        pendientes = np.arange(k)
+        for _ in range(10):
+            if not pendientes.size:
+                break
+            candidatas = sortear(pendientes.size)
+            enteras = candidatas.astype(np.intp)
+            lejos = ~self.campo_peligros.es_prohibido(enteras[:, 0], enteras[:, 1])
+            posiciones[pendientes[lejos]] = candidatas[lejos]
+            pendientes = pendientes[~lejos]
+        posiciones[pendientes] = sortear(pendientes.size)
+        return posiciones
+
+    def agregar_recursos(self, k):
+        nuevos = np.arange(len(self.recursos_pos), len(self.recursos_pos) + k)
+        posiciones = self._posiciones_recurso(k)
+        self.recursos_pos = np.concatenate([self.recursos_pos, posiciones])
+        self.recursos_disponible = np.concatenate([self.recursos_disponible, np.ones(k, dtype=bool)])
+        self.indice_recursos.insertar(nuevos, posiciones)
+
+    def reponer_recursos(self):
+        # Los recursos consumidos reaparecen en otra posición (se reutiliza su fila)
+        consumidos = np.flatnonzero(~self.recursos_disponible)
+        self.recursos_pos[consumidos] = self._posiciones_recurso(consumidos.size)
+        self.recursos_disponible[consumidos] = True
+        self.indice_recursos.insertar(consumidos, self.recursos_pos[consumidos])
+        return consumidos.size
+
+    # --- Comportamientos (equivalentes por lotes a los métodos de Criatura) ---
+    def _direccion_deseada(self, deseo, velocidad):
+        return calcular_direccion_deseada(deseo, velocidad, self.p["VELOCIDAD_MAX_CRIATURA"], self.p["FUERZA_MAX_DIRECCION"])
+
+    def medir_peligros(self, perfil=SIN_PERFIL):
+        # Distancias de cada criatura a los peligros candidatos de su celda del campo, en
+        # un solo cálculo: la mínima va a las estadísticas del frame y los pares a la vista
+        # sirven para evadir al empezar el siguiente (los peligros no se mueven)
+        i, k = self.campo_peligros.candidatos(self.pos)
+        diferencia = self.pos[i] - self.peligros_pos[k]
+        dist = np.sqrt(np.einsum('ij,ij->i', diferencia, diferencia))
+        perfil.contar("distancias", dist.size)
+        a_la_vista = (dist > 0) & (dist < self.p["RADIO_VISION_PELIGRO_CRIATURA"])
+        self.peligros_a_la_vista = (i[a_la_vista], diferencia[a_la_vista], dist[a_la_vista])
+        self.dist_min_peligro = np.full(len(self.pos), np.inf)
+        np.minimum.at(self.dist_min_peligro, i, dist)
+        self.pos_medida = self.pos.copy()
+
+    def evadir(self, perfil=SIN_PERFIL):
+        n = len(self.pos)
+        radio = self.p["RADIO_VISION_PELIGRO_CRIATURA"]
+        if self.pos_medida is None or not np.array_equal(self.pos_medida, self.pos):
+            self.medir_peligros(perfil) # Primer frame (o posiciones cambiadas desde fuera)
+        i, alejarse, dist = self.peligros_a_la_vista
+        fuerzas = self._direccion_deseada(alejarse, self.vel[i]) * (radio / dist)[:, None]
+        cuenta = np.bincount(i, minlength=n)
+        fuerza = _sumar_por_indice(i, fuerzas, n)
+        con_peligro = cuenta > 0
+        fuerza[con_peligro] /= cuenta[con_peligro, None]
+        return limitar_fuerza(fuerza, self.p["FUERZA_MAX_DIRECCION"] * 1.5)
+
+    def buscar(self, perfil=SIN_PERFIL, filas=None):
+        # Devuelve la fuerza y el índice del recurso disponible más cercano (-1 si no hay);
+        # la fuerza sólo se calcula para las `filas` indicadas (todas si es None)
+        n = len(self.pos)
+        radio = self.p["RADIO_VISION_RECURSO_CRIATURA"]
+        objetivo, comparados = self.indice_recursos.mas_cercano(self.pos, radio, candidatos=True)
+        perfil.contar("distancias", comparados)
+
+        fuerza = np.zeros((n, 2))
+        con_objetivo = objetivo >= 0
+        if filas is not None:
+            con_objetivo &= filas
+        fuerza[con_objetivo] = self._direccion_deseada(self.recursos_pos[objetivo[con_objetivo]] - self.pos[con_objetivo],
+                                                       self.vel[con_objetivo])
+        return fuerza, objetivo
+
+    def orden_criaturas(self):
+        # Las criaturas ordenadas por celdas del radio de vecindad. Se arma a lo sumo una
+        # vez por paso y lo comparten el dibujo del frame y los vecinos del paso siguiente.
+        if self._orden_criaturas is None:
+            radio = max(self.p["DISTANCIA_SEPARACION_CRIATURA"], self.p["RADIO_VISION_OTRA_CRIATURA"])
+            self._orden_criaturas = OrdenCeldas(self.pos, radio)
+        return self._orden_criaturas
+
+    def criaturas_en_rectangulo(self, x0, y0, x1, y1):
+        # Índices de las criaturas de las celdas que tocan el rectángulo (para dibujar)
+        if not len(self.pos):
+            return np.empty(0, dtype=np.intp)
+        return self.orden_criaturas().en_rectangulo(x0, y0, x1, y1)
+
+    def _vecinos(self, perfil=SIN_PERFIL):
+        # Pares (i, j), i != j, dentro del mayor de los radios de separación y cohesión
+        radio = max(self.p["DISTANCIA_SEPARACION_CRIATURA"], self.p["RADIO_VISION_OTRA_CRIATURA"])
+        ordenados = self.orden_criaturas() if len(self.pos) else None
+        i, j, diferencia, comparados = pares_cercanos(self.pos, self.pos, radio, candidatos=True, ordenados=ordenados)
+        perfil.contar("candidatos_vecinos", comparados)
+        perfil.contar("distancias", comparados)
+        distinta = i != j
+        i, j, diferencia = i[distinta], j[distinta], diferencia[distinta]
+        return i, j, diferencia, _normas(diferencia)
+
+    def separar(self, vecinos):
+        n = len(self.pos)
+        i, _, diferencia, dist = vecinos
+        cerca = (dist > 0) & (dist < self.p["DISTANCIA_SEPARACION_CRIATURA"])
+        i, diferencia, dist = i[cerca], diferencia[cerca], dist[cerca]
+        cuenta = np.bincount(i, minlength=n)
+        acumulada = _sumar_por_indice(i, diferencia / (dist * dist)[:, None], n)
+        con_vecinos = cuenta > 0
+        acumulada[con_vecinos] /= cuenta[con_vecinos, None]
+        acumulada = escalar_a_longitud(acumulada, self.p["VELOCIDAD_MAX_CRIATURA"])[0]
+        fuerza = np.where(con_vecinos[:, None], acumulada - self.vel, 0.0)
+        return limitar_fuerza(fuerza, self.p["FUERZA_MAX_DIRECCION"] * 1.2)
+
+    def cohesionar(self, vecinos, filas=None):
+        n = len(self.pos)
+        i, j, _, dist = vecinos
+        cerca = dist < self.p["RADIO_VISION_OTRA_CRIATURA"]
+        if filas is not None:
+            cerca &= filas[i]
+        i, j = i[cerca], j[cerca]
+        cuenta = np.bincount(i, minlength=n)
+        centro_masa = _sumar_por_indice(i, self.pos[j], n)
+        con_vecinos = cuenta > 0
+        centro_masa[con_vecinos] /= cuenta[con_vecinos, None]
+        fuerza = np.zeros((n, 2))
+        fuerza[con_vecinos] = self._direccion_deseada(centro_masa[con_vecinos] - self.pos[con_vecinos],
+                                                      self.vel[con_vecinos])
+        return fuerza
+
+    def explorar(self, filas):
+        # Sólo para las filas indicadas (los sorteos son uno por criatura que explora)
+        velocidad = self.vel[filas]
+        circulo_futuro = velocidad.copy()
+        quietas = ~circulo_futuro.any(axis=1)
+        circulo_futuro[quietas] = self.rng.uniform(-1, 1, (quietas.sum(), 2))
+        circulo_futuro = escalar_a_longitud(circulo_futuro, 20)[0]
+        desplazamiento = escalar_a_longitud(self.rng.uniform(-1, 1, (len(velocidad), 2)), 10)[0]
+        return self._direccion_deseada(circulo_futuro + desplazamiento, velocidad)
+
+    def calcular_fuerzas(self, perfil=SIN_PERFIL):
+        # Todo lo que no usa el generador aleatorio: la fuerza de cada criatura sin la
+        # exploración, la separación ya pesada, estados, objetivos y el peso que tendrá
+        # la exploración. Como Criatura, las fuerzas de búsqueda y cohesión sólo se
+        # calculan para las criaturas cuyo estado las usa.
+        p = self.p
+        vecinos = self._vecinos(perfil)
+        f_evasion = self.evadir(perfil)
+        evadiendo = f_evasion.any(axis=1)
+        f_busqueda, objetivo = self.buscar(perfil, ~evadiendo)
+        perfil.marcar("percepcion")
+        f_separacion = self.separar(vecinos)
+        buscando = ~evadiendo & f_busqueda.any(axis=1)
+        explorando = ~evadiendo & ~buscando
+        f_cohesion = self.cohesionar(vecinos, explorando)
+
+        peso_exploracion = np.where(f_cohesion.any(axis=1), p["PESO_EXPLORACION"], p["PESO_EXPLORACION"] * 1.5)
+        fuerza = np.zeros_like(self.vel)
+        fuerza[evadiendo] = f_evasion[evadiendo] * p["PESO_EVASION"]
+        fuerza[buscando] = f_busqueda[buscando] * p["PESO_BUSQUEDA"]
+        fuerza[explorando] = f_cohesion[explorando] * p["PESO_COHESION"]
+
+        estado = np.full(len(self.pos), ESTADO_EXPLORANDO, dtype=np.int8)
+        estado[buscando] = ESTADO_BUSCANDO
+        estado[evadiendo] = ESTADO_EVADIENDO
+        return fuerza, f_separacion * p["PESO_SEPARACION"], estado, objetivo, peso_exploracion
+
+    def actualizar_comportamiento(self, perfil=SIN_PERFIL):
+        fuerza, separacion, estado, objetivo, peso_exploracion = self.calcular_fuerzas(perfil)
+        explorando = estado == ESTADO_EXPLORANDO
+        fuerza[explorando] += self.explorar(explorando) * peso_exploracion[explorando, None]
+        # La separación siempre se aplica, sumada a la fuerza dominante
+        fuerza += separacion
+
+        self.estado[:] = estado
+        self.objetivo = objetivo
+        self.vel += fuerza
+        limitar_fuerza(self.vel, self.p["VELOCIDAD_MAX_CRIATURA"])
+        return objetivo
+
+    def mantener_en_pantalla(self):
+        buffer = self.p["RADIO_CRIATURA"]
+        for eje, limite in ((0, self.ancho), (1, self.alto)):
+            c = self.pos[:, eje]
+            c[:] = np.where(c > limite + buffer, -buffer, np.where(c < -buffer, limite + buffer, c))
+
+    def consumir(self, perfil=SIN_PERFIL):
+        # Cada recurso disponible al alcance de alguna criatura se consume una sola vez
+        _, k, _, comparados = self.indice_recursos.pares(self.pos, self.p["UMBRAL_CONSUMO_RECURSO"], candidatos=True)
+        perfil.contar("distancias", comparados)
+        return self._marcar_consumidos(np.unique(k))
+
+    def _marcar_consumidos(self, consumidos):
+        # consumidos: índices ordenados y sin repetir de recursos disponibles
+        self.recursos_disponible[consumidos] = False
+        self.indice_recursos.eliminar(consumidos)
+        self.ultimo_consumo = np.zeros(len(self.recursos_pos), dtype=bool)
+        self.ultimo_consumo[consumidos] = True
+        return consumidos.size
+
+    def paso(self, perfil=SIN_PERFIL):
+        # Un frame completo: comportamiento, movimiento, consumo y reposición de recursos
+        objetivo = self.actualizar_comportamiento(perfil)
+        self.pos += self.vel
+        self.mantener_en_pantalla()
+        self._orden_criaturas = None
+        perfil.marcar("direccion")
+        consumidos = self.consumir(perfil)
+        perfil.marcar("consumo")
+        perfil.contar("recursos_repuestos", self.reponer_recursos())
+        perfil.marcar("reposicion")
+        self.medir_peligros(perfil)
+        return consumidos, objetivo
+
+    def resumen_frame(self, consumidos, objetivo):
+        # Las mismas estadísticas que recoge el bucle de sprites para cada frame
+        cuenta_estados = np.bincount(self.estado, minlength=len(ESTADOS))
+        dist_prom_peligro = np.nan
+        if len(self.pos) and len(self.peligros_pos):
+            dist_prom_peligro = self.dist_min_peligro.mean() # Medida por medir_peligros al final del paso
+        # Sólo los objetivos que siguen disponibles (los consumidos ya se repusieron en otro sitio)
+        buscando = np.flatnonzero((self.estado == ESTADO_BUSCANDO) & (objetivo >= 0))
+        buscando = buscando[~self.ultimo_consumo[objetivo[buscando]]]
+        dist_prom_recurso = np.nan
+        if buscando.size:
+            dist_prom_recurso = _normas(self.pos[buscando] - self.recursos_pos[objetivo[buscando]]).mean()
+        return {
+            "num_criaturas": len(self.pos),
+            "num_recursos": len(self.recursos_pos),
+            "consumidos": consumidos,
+            "buscando": int(cuenta_estados[ESTADO_BUSCANDO]),
+            "evadiendo": int(cuenta_estados[ESTADO_EVADIENDO]),
+            "explorando": int(cuenta_estados[ESTADO_EXPLORANDO]),
+            "dist_prom_peligro": dist_prom_peligro,
+            "dist_prom_recurso_buscando": dist_prom_recurso,
+        }
@@ -0,0 +1,73 @@
+# --- Constantes ---
+ANCHO_PANTALLA = 800 # Tamaño del mundo (puede ser mayor que la ventana)
+ALTO_PANTALLA = 600
+ANCHO_VENTANA = 800 # Tamaño de la ventana (a lo sumo el del mundo); la cámara recorre el mundo
+ALTO_VENTANA = 600
+FPS = 30
+MAX_FRAMES_SIMULACION = 1000
+MOTOR = "objetos" # "objetos" (sprites, modelo de referencia), "vectorizado" (MotorVectorizado) o "paralelo" (MotorParalelo)
+PROCESOS = 0 # Procesos del motor paralelo (0 = uno por núcleo)
+TESELAS = 0 # Teselas en que el motor paralelo divide el mundo (0 = una por proceso)
+SEMILLA = None # Semilla del generador aleatorio (None = distinta en cada corrida)
+DIRECTORIO_ESTADISTICAS = None # Si se indica, las estadísticas se vuelcan a disco por bloques
+FRAMES_POR_BLOQUE_ESTADISTICAS = 100_000
+ARCHIVO_INSTANTANEA = None # Si se indica, se guarda ahí el estado completo para poder reanudar
+FRAMES_POR_INSTANTANEA = 0 # Cada cuántos frames se guarda (0 = sólo al terminar)
+DIRECTORIO_TRAYECTORIA = None # Si se indica, se graban ahí posiciones, velocidades y estados de cada frame
+FRAMES_POR_BLOQUE_TRAYECTORIA = 1000
+PASOS_POR_FRAME = 1 # Pasos de simulación por frame dibujado con ventana (0 = automático según FPS)
+CELDA_DIBUJO = 64 # Lado de las celdas de los índices que eligen qué dibujar dentro de la cámara
+
+NUM_CRIATURAS_INICIALES = 30
+NUM_RECURSOS_INICIALES = 20
+NUM_PELIGROS = 2
+
+BLANCO = (255, 255, 255)
+NEGRO = (0, 0, 0)
+GRIS_CLARO = (200, 200, 200)
+COLOR_CRIATURA_RGB = (0, 150, 255)
+COLOR_PELIGRO_RGB = (255, 0, 0)
+COLOR_RECURSO_RGB = (0, 255, 0)
+COLOR_EXPLORANDO_RGB = (100, 100, 100)
+
+COLOR_CRIATURA_MPL = tuple(c/255 for c in COLOR_CRIATURA_RGB)
+COLOR_PELIGRO_MPL = tuple(c/255 for c in COLOR_PELIGRO_RGB)
+COLOR_RECURSO_MPL = tuple(c/255 for c in COLOR_RECURSO_RGB)
+COLOR_EXPLORANDO_MPL = tuple(c/255 for c in COLOR_EXPLORANDO_RGB)
+
+
+RADIO_CRIATURA = 8
+RADIO_RECURSO = 5
+RADIO_PELIGRO_VISUAL = 15
+VELOCIDAD_MAX_CRIATURA = 2.5
+FUERZA_MAX_DIRECCION = 0.1 # Steering force limit
+RADIO_VISION_RECURSO_CRIATURA = 100
+RADIO_VISION_PELIGRO_CRIATURA = 120
+CELDA_CAMPO_PELIGROS = 20 # Lado de las celdas del campo precalculado de peligros
+RADIO_VISION_OTRA_CRIATURA = 50 # Para cohesión
+DISTANCIA_SEPARACION_CRIATURA = 25 # Para separación
+UMBRAL_CONSUMO_RECURSO = RADIO_CRIATURA + RADIO_RECURSO
+
+# Pesos para las fuerzas (usados por Criatura y por el motor vectorizado)
+PESO_EVASION = 2.5
+PESO_SEPARACION = 1.8
+PESO_BUSQUEDA = 1.0
+PESO_COHESION = 0.5
+PESO_EXPLORACION = 0.3
+
+# Estados de las criaturas: el código entero es el índice en ESTADOS
+ESTADO_EXPLORANDO = 0
+ESTADO_BUSCANDO = 1
+ESTADO_EVADIENDO = 2
+ESTADOS = ("EXPLORANDO", "BUSCANDO", "EVADIENDO")
+
+
+def resolver_parametros(cambios=None):
+    # Copia de las constantes del modelo con los cambios aplicados encima,
+    # para poder variar parámetros por simulación sin tocar este módulo
+    parametros = {nombre: valor for nombre, valor in globals().items() if nombre.isupper()}
+    for nombre, valor in (cambios or {}).items():
+        if nombre not in parametros:
+            raise ValueError(f"Parámetro desconocido: {nombre}")
+        parametros[nombre] = valor
+    return parametros
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+from registro import RegistroEstadisticas
+
+# Fases de un frame, en el orden en que ocurren (las de la ventana sólo se miden con pantalla)
+FASES = ("eventos", "percepcion", "direccion", "consumo", "reposicion", "estadisticas", "dibujo", "pantalla", "espera")
+# Contadores por frame: distancias calculadas (o pares candidatos comparados),
+# criaturas candidatas devueltas por la rejilla de vecinos y recursos repuestos
+CONTADORES = ("distancias", "candidatos_vecinos", "recursos_repuestos")
+
+
+class Perfil:
+    # Tiempos por fase de cada frame, tomados como vueltas de cronómetro:
+    # marcar(fase) suma a esa fase el tiempo desde la marca anterior, así que cada
+    # medición cuesta una sola llamada a perf_counter. Los frames se guardan en un
+    # RegistroEstadisticas (una columna por fase, "total" y una por contador) y,
+    # al cerrar cada uno, se avisa a las funciones suscritas con su fila.
+    activo = True
+
+    def __init__(self, fases=FASES, contadores=CONTADORES, suavizado=0.1):
+        self.fases = tuple(fases)
+        self.contadores = tuple(contadores)
+        self.registro = RegistroEstadisticas({**dict.fromkeys(self.fases, np.float64), "total": np.float64,
+                                              **dict.fromkeys(self.contadores, np.int64)})
+        self.suavizado = suavizado
+        self.promedio_movil = {} # Media exponencial de cada columna, para mostrar en pantalla
+        self._actual = dict.fromkeys(self.fases, 0.0)
+        self._cuentas = dict.fromkeys(self.contadores, 0)
+        self._suscriptores = []
+        self._inicio = self._marca = time.perf_counter()
+
+    def suscribir(self, funcion):
+        # funcion(fila) se llama al terminar cada frame; fila tiene segundos por fase y los contadores
+        self._suscriptores.append(funcion)
+        return funcion
+
+    def desuscribir(self, funcion):
+        self._suscriptores.remove(funcion)
+
+    def iniciar_frame(self):
+        for fase in self._actual:
+            self._actual[fase] = 0.0
+        for nombre in self._cuentas:
+            self._cuentas[nombre] = 0
+        self._inicio = self._marca = time.perf_counter()
+
+    def marcar(self, fase):
+        ahora = time.perf_counter()
+        self._actual[fase] += ahora - self._marca
+        self._marca = ahora
+
+    def contar(self, nombre, cantidad=1):
+        self._cuentas[nombre] += cantidad
+
+    def terminar_frame(self):
+        fila = dict(self._actual, total=time.perf_counter() - self._inicio, **self._cuentas)
+        self.registro.agregar(fila)
+        for nombre, valor in fila.items():
+            anterior = self.promedio_movil.get(nombre, valor)
+            self.promedio_movil[nombre] = anterior + self.suavizado * (valor - anterior)
+        for funcion in self._suscriptores:
+            funcion(fila)
+        return fila
+
+    def tiempos(self):
+        return self.registro.estadisticas()
+
+    def exportar(self, ruta):
+        # .csv (una fila por frame, tiempos en segundos) o .npz (una columna por array)
+        tiempos = self.tiempos()
+        if ruta.endswith(".csv"):
+            formatos = ["%d" if columna.dtype.kind == "i" else "%.9f" for columna in tiempos.values()]
+            np.savetxt(ruta, np.column_stack(list(tiempos.values())), delimiter=",", fmt=formatos,
+                       header=",".join(tiempos), comments="")
+        else:
+            np.savez(ruta, **tiempos)
+
+
+class PerfilNulo:
+    # Se usa cuando no se mide nada: las marcas no hacen nada
+    activo = False
+
+    def iniciar_frame(self):
+        pass
+
+    def marcar(self, fase):
+        pass
+
+    def contar(self, nombre, cantidad=1):
+        pass
+
+    def terminar_frame(self):
+        return None
+
+SIN_PERFIL = PerfilNulo()
@@ -0,0 +1,63 @@
+import time
+
+# --- Pasos por frame ---
+# Con ventana, cada frame dibujado puede avanzar K pasos de simulación. Cada paso
+# sigue siendo el mismo paso fijo (y registra sus estadísticas); sólo cambia cuántos
+# se dan entre dos dibujos. K se elige con el teclado (1x/10x/100x) o en modo
+# automático, donde se ajusta para llenar el tiempo de un frame a FPS.
+
+VELOCIDADES = (1, 10, 100)
+
+
+class Planificador:
+    def __init__(self, pasos_por_frame=1, fps=30, max_pasos=10_000, suavizado=0.2):
+        # pasos_por_frame=0: modo automático
+        self.automatico = pasos_por_frame <= 0
+        self.pasos = max(1, pasos_por_frame)
+        self.presupuesto = 1.0 / fps
+        self.max_pasos = max_pasos
+        self.suavizado = suavizado
+        self.tiempo_paso = None # Media exponencial de segundos por paso
+        self.tiempo_resto = 0.0 # Media exponencial del resto del frame (eventos, dibujo, pantalla)
+
+    def fijar(self, pasos):
+        self.automatico = False
+        self.pasos = pasos
+
+    def alternar_automatico(self):
+        self.automatico = not self.automatico
+        if not self.automatico:
+            self.pasos = 1
+
+    def avanzar(self, sim, limite):
+        # Da hasta self.pasos pasos sin pasar de `limite` frames. Devuelve el resumen
+        # del último paso (None si no quedan criaturas) y cuántos pasos se dieron.
+        inicio = time.perf_counter()
+        resumen, dados = None, 0
+        for _ in range(min(self.pasos, limite - sim.frame_actual)):
+            resumen = sim.paso()
+            if resumen is None:
+                break
+            dados += 1
+        if dados:
+            self._suavizar("tiempo_paso", (time.perf_counter() - inicio) / dados)
+        return resumen, dados
+
+    def terminar_frame(self, trabajo, pasos):
+        # trabajo: segundos del frame sin contar la espera del reloj. Con el tiempo
+        # por paso y el del resto del frame elige K para el frame siguiente, y no lo
+        # deja más que duplicarse de un frame a otro para que no oscile.
+        if self.tiempo_paso is None:
+            return
+        self._suavizar("tiempo_resto", max(0.0, trabajo - pasos * self.tiempo_paso))
+        if self.automatico:
+            disponible = self.presupuesto - self.tiempo_resto
+            pasos = int(disponible / max(self.tiempo_paso, 1e-9))
+            self.pasos = max(1, min(pasos, 2 * self.pasos, self.max_pasos))
+
+    def _suavizar(self, nombre, valor):
+        anterior = getattr(self, nombre)
+        setattr(self, nombre, valor if anterior is None else anterior + self.suavizado * (valor - anterior))
+
+    def etiqueta(self):
+        return f"auto ({self.pasos}x)" if self.automatico else f"{self.pasos}x"
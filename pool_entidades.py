@@ -0,0 +1,33 @@
+class PoolEntidades:
+    # Entidades de un tipo (sprites) que se reciclan en vez de crearse y destruirse:
+    # liberar() saca a la entidad de sus grupos y la deja en una lista libre, y crear()
+    # reutiliza una libre, reiniciándola en su lugar con los mismos argumentos que
+    # tomaría el constructor, antes de construir otra. `vivas` lleva la cuenta sin
+    # recorrer los grupos. `entidades` tiene todas las creadas alguna vez, en orden de
+    # creación (lugares estables, vivas o no).
+    def __init__(self, clase, *grupos):
+        self.clase = clase
+        self.grupos = grupos
+        self.entidades = []
+        self.libres = []
+        self.vivas = 0
+
+    def crear(self, *argumentos):
+        if self.libres:
+            entidad = self.libres.pop()
+            entidad.reiniciar(*argumentos)
+        else:
+            entidad = self.clase(*argumentos)
+            self.entidades.append(entidad)
+        for grupo in self.grupos:
+            grupo.add(entidad)
+        self.vivas += 1
+        return entidad
+
+    def liberar(self, entidad):
+        entidad.kill()
+        self.libres.append(entidad)
+        self.vivas -= 1
+
+    def __len__(self):
+        return self.vivas
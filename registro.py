@@ -0,0 +1,119 @@
+import glob
+import os
+
+import numpy as np
+
+# Columnas que registra la simulación en cada frame
+CAMPOS_ESTADISTICAS = {
+    "frames": np.int64,
+    "num_criaturas_vivas": np.int64,
+    "num_recursos_disponibles": np.int64,
+    "recursos_consumidos_total": np.int64,
+    "estado_buscando": np.int64,
+    "estado_evadiendo": np.int64,
+    "estado_explorando": np.int64,
+    "dist_prom_peligro": np.float64,
+    "dist_prom_recurso_buscando": np.float64,
+}
+
+
+class RegistroEstadisticas:
+    # Estadísticas por frame guardadas en columnas de NumPy preasignadas, que
+    # duplican su capacidad cuando se llenan; agregar un frame sólo escribe su fila.
+    # Con un directorio, cada `filas_por_bloque` filas se vuelcan a un .npz y se
+    # liberan, de modo que la memoria queda acotada aunque la corrida tenga millones
+    # de frames.
+    def __init__(self, campos=None, capacidad=1024, directorio=None, filas_por_bloque=100_000, instantanea=None):
+        self.campos = dict(campos or CAMPOS_ESTADISTICAS)
+        self.directorio = directorio
+        self.filas_por_bloque = filas_por_bloque
+        self._capacidad = max(1, capacidad)
+        self._columnas = {nombre: np.empty(self._capacidad, dtype=tipo) for nombre, tipo in self.campos.items()}
+        self._filas = 0 # Filas en memoria
+        self.bloques_volcados = 0
+        self.filas_volcadas = 0
+        self._suscriptores = []
+        if directorio is not None:
+            os.makedirs(directorio, exist_ok=True)
+        if instantanea is not None:
+            self._restaurar(instantanea)
+
+    def __len__(self):
+        return self.filas_volcadas + self._filas
+
+    def suscribir(self, funcion):
+        # funcion(fila) se llama con cada fila agregada (p.ej. para una gráfica en vivo)
+        self._suscriptores.append(funcion)
+        return funcion
+
+    def desuscribir(self, funcion):
+        self._suscriptores.remove(funcion)
+
+    def agregar(self, fila):
+        # Cada fila debe traer todas las columnas
+        if self._filas == self._capacidad:
+            self._crecer()
+        for nombre, valor in fila.items():
+            self._columnas[nombre][self._filas] = valor
+        self._filas += 1
+        if self.directorio is not None and self._filas >= self.filas_por_bloque:
+            self.volcar()
+        for funcion in self._suscriptores:
+            funcion(fila)
+
+    def _crecer(self):
+        self._capacidad *= 2
+        for nombre, columna in self._columnas.items():
+            nueva = np.empty(self._capacidad, dtype=columna.dtype)
+            nueva[:self._filas] = columna[:self._filas]
+            self._columnas[nombre] = nueva
+
+    def columnas(self):
+        # Vistas (sin copiar) de las filas que siguen en memoria
+        return {nombre: columna[:self._filas] for nombre, columna in self._columnas.items()}
+
+    def volcar(self):
+        if self.directorio is None or not self._filas:
+            return
+        ruta = os.path.join(self.directorio, f"estadisticas_{self.bloques_volcados:06d}.npz")
+        np.savez(ruta, **self.columnas())
+        self.bloques_volcados += 1
+        self.filas_volcadas += self._filas
+        self._filas = 0
+
+    def instantanea(self):
+        # Las filas en memoria; los bloques ya volcados siguen en el directorio
+        datos = {f"columna/{nombre}": columna for nombre, columna in self.columnas().items()}
+        datos["volcados"] = np.array([self.bloques_volcados, self.filas_volcadas])
+        return datos
+
+    def _restaurar(self, datos):
+        filas = len(datos[f"columna/{next(iter(self.campos))}"])
+        while self._capacidad < filas:
+            self._capacidad *= 2
+        for nombre, tipo in self.campos.items():
+            self._columnas[nombre] = np.empty(self._capacidad, dtype=tipo)
+            self._columnas[nombre][:filas] = datos[f"columna/{nombre}"]
+        self._filas = filas
+        self.bloques_volcados, self.filas_volcadas = datos["volcados"].tolist()
+
+    def estadisticas(self, con_volcados=True):
+        # Todas las filas: los bloques del disco (si los hay) seguidos de las que están en
+        # memoria. Con con_volcados=False, sólo las de memoria: las volcadas quedan en
+        # self.directorio y se leen por partes con cargar_registro (sin juntar la corrida entera)
+        if not self.bloques_volcados or not con_volcados:
+            return {nombre: columna.copy() for nombre, columna in self.columnas().items()}
+        bloques = cargar_registro(self.directorio, bloques=self.bloques_volcados)
+        return {nombre: np.concatenate([bloques[nombre], columna]) for nombre, columna in self.columnas().items()}
+
+
+def cargar_registro(directorio, campos=None, bloques=None):
+    # Une los bloques volcados por RegistroEstadisticas (sólo las columnas pedidas y
+    # los primeros `bloques`, si se indican)
+    rutas = sorted(glob.glob(os.path.join(directorio, "estadisticas_*.npz")))[:bloques]
+    series = {}
+    for ruta in rutas:
+        with np.load(ruta) as bloque:
+            for nombre in campos or bloque.files:
+                series.setdefault(nombre, []).append(bloque[nombre])
+    return {nombre: np.concatenate(partes) for nombre, partes in series.items()}
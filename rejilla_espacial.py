@@ -0,0 +1,315 @@
+import math
+
+import numpy as np
+
+
+class RejillaEspacial:
+    # Rejilla uniforme de celdas cuadradas para encontrar vecinos sin recorrer todas
+    # las criaturas. El mundo es toroidal (mantener_en_pantalla teletransporta de
+    # un borde al opuesto), así que los índices de celda se toman módulo el número
+    # de columnas/filas: una criatura que cruza el borde simplemente cambia de celda.
+    # Cada celda es un dict usado como conjunto ordenado, para que el orden de los
+    # candidatos sólo dependa del orden de inserción (resultados reproducibles).
+    def __init__(self, ancho, alto, tam_celda, margen=0):
+        self.tam_celda = tam_celda
+        self.origen = -margen
+        self.columnas = max(1, math.ceil((ancho + 2 * margen) / tam_celda))
+        self.filas = max(1, math.ceil((alto + 2 * margen) / tam_celda))
+        self.celdas = {}
+        self.celda_de = {}
+
+    def _celda(self, posicion):
+        return (int((posicion.x - self.origen) // self.tam_celda) % self.columnas,
+                int((posicion.y - self.origen) // self.tam_celda) % self.filas)
+
+    def insertar(self, agente):
+        celda = self._celda(agente.posicion)
+        self.celdas.setdefault(celda, {})[agente] = None
+        self.celda_de[agente] = celda
+
+    def eliminar(self, agente):
+        celda = self.celda_de.pop(agente, None)
+        if celda is not None:
+            del self.celdas[celda][agente]
+
+    def mover(self, agente):
+        # Llamar después de cambiar agente.posicion; O(1) si no cambia de celda
+        celda = self._celda(agente.posicion)
+        if self.celda_de.get(agente) != celda:
+            self.eliminar(agente)
+            self.celdas.setdefault(celda, {})[agente] = None
+            self.celda_de[agente] = celda
+
+    def reconstruir(self, agentes):
+        self.celdas.clear()
+        self.celda_de.clear()
+        for agente in agentes:
+            self.insertar(agente)
+
+    def _indices(self, minimo, maximo, n):
+        primero = int((minimo - self.origen) // self.tam_celda)
+        ultimo = int((maximo - self.origen) // self.tam_celda)
+        if ultimo - primero + 1 >= n:
+            return range(n)
+        return [c % n for c in range(primero, ultimo + 1)]
+
+    def consultar(self, posicion, radio):
+        # Candidatos de las celdas que tocan el cuadrado de lado 2*radio alrededor de
+        # posicion. Puede incluir agentes más lejanos (y del otro lado del borde):
+        # quien consulta debe seguir comprobando la distancia exacta.
+        return self.en_rectangulo(posicion.x - radio, posicion.y - radio, posicion.x + radio, posicion.y + radio)
+
+    def en_rectangulo(self, x0, y0, x1, y1):
+        # Agentes de las celdas que tocan el rectángulo (también algunos de afuera)
+        candidatos = []
+        for cy in self._indices(y0, y1, self.filas):
+            for cx in self._indices(x0, x1, self.columnas):
+                celda = self.celdas.get((cx, cy))
+                if celda:
+                    candidatos.extend(celda)
+        return candidatos
+
+    def __len__(self):
+        return len(self.celda_de)
+
+
+def _celdas_en_rango(minimo, maximo, origen, tam_celda, n):
+    # Índices (módulo n) de las celdas de un eje que tocan [minimo, maximo]
+    primero = int((minimo - origen) // tam_celda)
+    ultimo = int((maximo - origen) // tam_celda)
+    if ultimo - primero + 1 >= n:
+        return np.arange(n)
+    return np.arange(primero, ultimo + 1) % n
+
+
+class OrdenCeldas:
+    # Puntos ordenados por celda, con celdas cuadradas de lado `tam_celda` desde
+    # `origen` hasta `extremo` (por defecto, las esquinas de los puntos): los de la
+    # celda k son orden[inicio[k]:inicio[k] + cuenta[k]]. Mientras los puntos no se
+    # muevan se puede reutilizar, para pares_cercanos o para consultar un rectángulo.
+    def __init__(self, puntos, tam_celda, origen=None, extremo=None):
+        self.tam_celda = tam_celda
+        self.origen = puntos.min(axis=0) if origen is None else origen
+        extremo = puntos.max(axis=0) if extremo is None else extremo
+        self.celdas = np.floor((extremo - self.origen) / tam_celda).astype(np.intp) + 1
+        celda = self.celda_de(puntos)
+        clave = celda[:, 1] * self.celdas[0] + celda[:, 0]
+        self.orden = np.argsort(clave, kind='stable')
+        self.cuenta = np.bincount(clave, minlength=self.celdas[0] * self.celdas[1])
+        self.inicio = np.cumsum(self.cuenta) - self.cuenta
+
+    def celda_de(self, puntos):
+        return np.minimum(np.floor((puntos - self.origen) / self.tam_celda).astype(np.intp), self.celdas - 1)
+
+    def en_rectangulo(self, x0, y0, x1, y1):
+        # Índices de los puntos de las celdas que tocan el rectángulo (también algunos de
+        # afuera); cuesta según las celdas y los puntos que hay ahí, no según el total
+        esquinas = np.floor((np.array([[x0, y0], [x1, y1]]) - self.origen) / self.tam_celda)
+        (cx0, cy0), (cx1, cy1) = esquinas.astype(np.intp).tolist()
+        columnas = np.arange(max(cx0, 0), min(cx1, self.celdas[0] - 1) + 1)
+        filas = np.arange(max(cy0, 0), min(cy1, self.celdas[1] - 1) + 1)
+        celdas = (filas[:, None] * self.celdas[0] + columnas[None, :]).ravel()
+        cuenta = self.cuenta[celdas]
+        desplazamiento = np.arange(cuenta.sum()) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        return self.orden[np.repeat(self.inicio[celdas], cuenta) + desplazamiento]
+
+
+def pares_cercanos(origenes, destinos, radio, candidatos=False, ordenados=None):
+    # Versión por arrays de la rejilla: devuelve los pares (i, j) con
+    # |origenes[i] - destinos[j]| < radio y sus diferencias origenes[i] - destinos[j].
+    # Los destinos se ordenan por celda (de lado >= radio) y cada origen sólo se
+    # compara con las 3x3 celdas que lo rodean; `ordenados` es ese OrdenCeldas de los
+    # destinos si ya se tiene. Con candidatos=True devuelve además cuántos pares se
+    # compararon.
+    vacio = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty((0, 2)))
+    if len(origenes) == 0 or len(destinos) == 0:
+        return vacio + (0,) if candidatos else vacio
+
+    # Destinos ordenados por celda: los de la celda k están en orden[inicio[k]:inicio[k] + cuenta[k]]
+    if ordenados is None:
+        ordenados = OrdenCeldas(destinos, radio, np.minimum(origenes.min(axis=0), destinos.min(axis=0)),
+                                np.maximum(origenes.max(axis=0), destinos.max(axis=0)))
+    celdas, orden, cuenta, inicio = ordenados.celdas, ordenados.orden, ordenados.cuenta, ordenados.inicio
+
+    celda_origen = ordenados.celda_de(origenes)
+    lista_i, lista_j = [], []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            cx = celda_origen[:, 0] + dx
+            cy = celda_origen[:, 1] + dy
+            validos = np.flatnonzero((cx >= 0) & (cx < celdas[0]) & (cy >= 0) & (cy < celdas[1]))
+            vecina = cy[validos] * celdas[0] + cx[validos]
+            n_candidatos = cuenta[vecina]
+            total = n_candidatos.sum()
+            if total == 0:
+                continue
+            desplazamiento = np.arange(total) - np.repeat(np.cumsum(n_candidatos) - n_candidatos, n_candidatos)
+            lista_i.append(np.repeat(validos, n_candidatos))
+            lista_j.append(orden[np.repeat(inicio[vecina], n_candidatos) + desplazamiento])
+    if not lista_i:
+        return vacio + (0,) if candidatos else vacio
+    i = np.concatenate(lista_i)
+    j = np.concatenate(lista_j)
+    diferencia = origenes[i] - destinos[j]
+    cerca = np.einsum('ij,ij->i', diferencia, diferencia) < radio * radio
+    if candidatos:
+        return i[cerca], j[cerca], diferencia[cerca], len(i)
+    return i[cerca], j[cerca], diferencia[cerca]
+
+
+class RejillaCubetas:
+    # Índice espacial incremental para puntos numerados (p.ej. las filas de los
+    # recursos del motor vectorizado). Cada celda es una fila de cubetas de tamaño
+    # fijo con los índices de sus puntos (-1 en los huecos), así que insertar y
+    # eliminar sólo tocan las filas afectadas y las consultas se hacen con arrays.
+    # Como RejillaEspacial, las celdas se toman módulo el tamaño del mundo.
+    def __init__(self, ancho, alto, tam_celda, margen=0, capacidad=8):
+        self.tam_celda = tam_celda
+        self.origen = -margen
+        self.columnas = max(1, math.ceil((ancho + 2 * margen) / tam_celda))
+        self.filas = max(1, math.ceil((alto + 2 * margen) / tam_celda))
+        self.cubetas = np.full((self.columnas * self.filas, capacidad), -1, dtype=np.intp)
+        self.ocupacion = np.zeros(self.columnas * self.filas, dtype=np.intp)
+        self.celda_de = np.empty(0, dtype=np.intp)
+        self.hueco_de = np.empty(0, dtype=np.intp)
+        self.pos = np.empty((0, 2))
+
+    def _coordenadas(self, puntos):
+        c = np.floor((puntos - self.origen) / self.tam_celda).astype(np.intp)
+        return c[:, 0] % self.columnas, c[:, 1] % self.filas
+
+    def _asegurar_ids(self, maximo):
+        faltan = maximo + 1 - len(self.celda_de)
+        if faltan > 0:
+            self.celda_de = np.concatenate([self.celda_de, np.full(faltan, -1, dtype=np.intp)])
+            self.hueco_de = np.concatenate([self.hueco_de, np.full(faltan, -1, dtype=np.intp)])
+            self.pos = np.concatenate([self.pos, np.zeros((faltan, 2))])
+
+    def insertar(self, ids, puntos):
+        ids = np.asarray(ids, dtype=np.intp)
+        if not ids.size:
+            return
+        self._asegurar_ids(ids.max())
+        cx, cy = self._coordenadas(puntos)
+        for id_, celda, punto in zip(ids.tolist(), (cy * self.columnas + cx).tolist(), puntos):
+            hueco = self.ocupacion[celda]
+            if hueco == self.cubetas.shape[1]:
+                extra = np.full_like(self.cubetas, -1)
+                self.cubetas = np.concatenate([self.cubetas, extra], axis=1)
+            self.cubetas[celda, hueco] = id_
+            self.ocupacion[celda] = hueco + 1
+            self.celda_de[id_] = celda
+            self.hueco_de[id_] = hueco
+            self.pos[id_] = punto
+
+    def eliminar(self, ids):
+        # El último de la celda ocupa el hueco que deja el eliminado
+        for id_ in np.asarray(ids, dtype=np.intp).tolist():
+            celda = self.celda_de[id_]
+            if celda < 0:
+                continue
+            hueco = self.hueco_de[id_]
+            ultimo = self.ocupacion[celda] - 1
+            movido = self.cubetas[celda, ultimo]
+            self.cubetas[celda, hueco] = movido
+            self.hueco_de[movido] = hueco
+            self.cubetas[celda, ultimo] = -1
+            self.ocupacion[celda] = ultimo
+            self.celda_de[id_] = -1
+            self.hueco_de[id_] = -1
+
+    def en_rectangulo(self, x0, y0, x1, y1):
+        # Índices guardados en las celdas que tocan el rectángulo (también algunos de afuera)
+        columnas = _celdas_en_rango(x0, x1, self.origen, self.tam_celda, self.columnas)
+        filas = _celdas_en_rango(y0, y1, self.origen, self.tam_celda, self.filas)
+        celdas = (filas[:, None] * self.columnas + columnas[None, :]).ravel()
+        ids = self.cubetas[celdas, :max(1, self.ocupacion.max())].ravel()
+        return ids[ids >= 0]
+
+    def _columnas_vecinas(self, c, alcance, n):
+        if 2 * alcance + 1 >= n:
+            return np.broadcast_to(np.arange(n), (len(c), n))
+        return (c[:, None] + np.arange(-alcance, alcance + 1)) % n
+
+    def _candidatos(self, puntos, radio):
+        # (n, m) con los índices guardados en las celdas alrededor de cada punto (-1 = hueco)
+        alcance = math.ceil(radio / self.tam_celda)
+        cx, cy = self._coordenadas(puntos)
+        columnas = self._columnas_vecinas(cx, alcance, self.columnas)
+        filas = self._columnas_vecinas(cy, alcance, self.filas)
+        celdas = (filas[:, :, None] * self.columnas + columnas[:, None, :]).reshape(len(puntos), -1)
+        usadas = max(1, self.ocupacion.max())
+        return self.cubetas[celdas, :usadas].reshape(len(puntos), -1)
+
+    def mas_cercano(self, puntos, radio, bloque=4096, candidatos=False):
+        # Índice del punto guardado más cercano con 0 < distancia < radio (-1 si no hay).
+        # Con candidatos=True devuelve además cuántas distancias se compararon.
+        resultado = np.full(len(puntos), -1, dtype=np.intp)
+        comparadas = 0
+        if not len(self.pos): # Nunca tuvo puntos: no hay filas a las que apuntar los huecos
+            return (resultado, comparadas) if candidatos else resultado
+        for inicio in range(0, len(puntos), bloque):
+            trozo = puntos[inicio:inicio + bloque]
+            en_celdas = self._candidatos(trozo, radio)
+            validos = en_celdas >= 0
+            if candidatos:
+                comparadas += int(np.count_nonzero(validos))
+            ids = np.where(validos, en_celdas, 0)
+            dx = trozo[:, 0, None] - self.pos[ids, 0]
+            dy = trozo[:, 1, None] - self.pos[ids, 1]
+            d2 = dx * dx + dy * dy
+            d2[~validos | (d2 == 0) | (d2 >= radio * radio)] = np.inf
+            mejor = np.argmin(d2, axis=1)
+            filas = np.arange(len(trozo))
+            resultado[inicio:inicio + len(trozo)] = np.where(np.isfinite(d2[filas, mejor]), ids[filas, mejor], -1)
+        if candidatos:
+            return resultado, comparadas
+        return resultado
+
+    def pares(self, puntos, radio, candidatos=False):
+        # Pares (i, id) con |puntos[i] - pos[id]| < radio y sus diferencias puntos[i] - pos[id]
+        # (y, con candidatos=True, cuántos pares se compararon)
+        if not len(puntos) or not len(self.pos):
+            vacio = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty((0, 2))
+            return vacio + (0,) if candidatos else vacio
+        en_celdas = self._candidatos(puntos, radio)
+        i, k = np.nonzero(en_celdas >= 0)
+        ids = en_celdas[i, k]
+        diferencia = puntos[i] - self.pos[ids]
+        cerca = np.einsum('ij,ij->i', diferencia, diferencia) < radio * radio
+        if candidatos:
+            return i[cerca], ids[cerca], diferencia[cerca], len(i)
+        return i[cerca], ids[cerca], diferencia[cerca]
+
+    def __len__(self):
+        return int(self.ocupacion.sum())
+
+
+class IndiceCeldas:
+    # Índice de puntos por celda construido de una sola vez (ordenando los puntos por
+    # celda, sin bucles en Python): los de la celda k son ids[inicio[k]:inicio[k + 1]].
+    # Sirve para puntos que no cambian (los peligros) o para una foto de los que se
+    # mueven que se consulta muchas veces, como las criaturas al dibujar un frame.
+    def __init__(self, puntos, ancho, alto, tam_celda):
+        self.tam_celda = tam_celda
+        self.columnas = max(1, math.ceil(ancho / tam_celda))
+        self.filas = max(1, math.ceil(alto / tam_celda))
+        c = np.floor(np.asarray(puntos, dtype=float).reshape(-1, 2) / tam_celda).astype(np.intp)
+        clave = (c[:, 1] % self.filas) * self.columnas + c[:, 0] % self.columnas
+        if self.columnas * self.filas <= 1 << 16:
+            # Con claves de 16 bits el orden estable de NumPy es radix sort (lineal)
+            self.ids = np.argsort(clave.astype(np.uint16), kind='stable')
+        else:
+            self.ids = np.argsort(clave, kind='stable')
+        self.inicio = np.zeros(self.columnas * self.filas + 1, dtype=np.intp)
+        self.inicio[1:] = np.cumsum(np.bincount(clave, minlength=self.columnas * self.filas))
+
+    def en_rectangulo(self, x0, y0, x1, y1):
+        # Índices de los puntos de las celdas que tocan el rectángulo (también algunos de
+        # afuera); cuesta según las celdas y los puntos que hay ahí, no según el total
+        columnas = _celdas_en_rango(x0, x1, 0, self.tam_celda, self.columnas)
+        filas = _celdas_en_rango(y0, y1, 0, self.tam_celda, self.filas)
+        celdas = (filas[:, None] * self.columnas + columnas[None, :]).ravel()
+        cuenta = self.inicio[celdas + 1] - self.inicio[celdas]
+        desplazamiento = np.arange(cuenta.sum()) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        return self.ids[np.repeat(self.inicio[celdas], cuenta) + desplazamiento]
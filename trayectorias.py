@@ -0,0 +1,298 @@
+import argparse
+import ast
+import json
+import os
+
+import numpy as np
+
+from parametros import ESTADO_BUSCANDO, ESTADO_EVADIENDO, ESTADO_EXPLORANDO, ESTADOS, GRIS_CLARO, NEGRO, resolver_parametros
+
+# --- Grabación de trayectorias ---
+# Un directorio con un índice (indice.json) y bloques de FRAMES_POR_BLOQUE frames.
+# Cada bloque guarda, en archivos .npy que se pueden abrir con np.load(mmap_mode="r"):
+#   criaturas_pos, criaturas_vel  (frames, n, 2) float32
+#   criaturas_estado              (frames, n) int8 (códigos de parametros.ESTADOS)
+#   recursos_pos, recursos_disponible   los lugares de recurso al empezar el bloque
+#   eventos                       (frame, lugar, x, y, disponible) de cada lugar que
+#                                 cambió en un frame del bloque
+# Los arrays de criaturas se escriben directamente en el archivo (open_memmap), y el
+# índice se reescribe al cerrar cada bloque: si la corrida se corta, lo ya cerrado se
+# puede leer. Para ver un frame sólo se abre su bloque y se aplican sus eventos de
+# recursos hasta ese frame, sin volver a simular nada.
+# Si el directorio ya tiene una grabación (p.ej. al reanudar desde una instantánea),
+# se sigue esa: se descartan los frames grabados desde el primero que se vuelve a
+# grabar y los bloques nuevos se agregan después de los que quedan.
+
+EVENTO = np.dtype([("frame", np.int64), ("lugar", np.int32), ("x", np.float32), ("y", np.float32),
+                   ("disponible", np.bool_)])
+
+
+class GrabadorTrayectorias:
+    def __init__(self, directorio, parametros, peligros_pos, frames_por_bloque=1000):
+        self.directorio = directorio
+        self.frames_por_bloque = frames_por_bloque
+        os.makedirs(directorio, exist_ok=True)
+        np.save(os.path.join(directorio, "peligros_pos.npy"), np.asarray(peligros_pos, dtype=np.float32).reshape(-1, 2))
+        self.indice = {"parametros": repr(parametros), "frames_por_bloque": frames_por_bloque, "bloques": []}
+        ruta_indice = os.path.join(directorio, "indice.json")
+        if os.path.exists(ruta_indice):
+            with open(ruta_indice) as archivo:
+                self.indice["bloques"] = json.load(archivo)["bloques"]
+        self._bloque = None
+        self._recursos_pos = None
+        self._recursos_disponible = None
+
+    def _ruta(self, bloque, nombre):
+        return os.path.join(self.directorio, f"bloque_{bloque:06d}_{nombre}.npy")
+
+    def _abrir_bloque(self, frame, n, recursos_pos, recursos_disponible):
+        numero = len(self.indice["bloques"])
+        forma = (self.frames_por_bloque, n)
+        self._arrays = {
+            "criaturas_pos": np.lib.format.open_memmap(self._ruta(numero, "criaturas_pos"), "w+", np.float32, forma + (2,)),
+            "criaturas_vel": np.lib.format.open_memmap(self._ruta(numero, "criaturas_vel"), "w+", np.float32, forma + (2,)),
+            "criaturas_estado": np.lib.format.open_memmap(self._ruta(numero, "criaturas_estado"), "w+", np.int8, forma),
+        }
+        np.save(self._ruta(numero, "recursos_pos"), recursos_pos.astype(np.float32))
+        np.save(self._ruta(numero, "recursos_disponible"), recursos_disponible)
+        self._eventos = []
+        self._bloque = {"numero": numero, "primer_frame": frame, "frames": 0, "criaturas": n}
+        self.indice["bloques"].append(self._bloque)
+
+    def grabar(self, frame, pos, vel, estado, recursos_pos, recursos_disponible):
+        # Un frame: arrays de las criaturas y los lugares de recurso (filas estables entre
+        # frames; pueden aparecer lugares nuevos al final)
+        recursos_pos = np.array(recursos_pos, dtype=np.float32).reshape(-1, 2)
+        recursos_disponible = np.array(recursos_disponible, dtype=bool) # Copia: el motor lo cambia en su lugar
+        bloque = self._bloque
+        if bloque is None:
+            self._recortar(frame)
+        if bloque is None or bloque["frames"] == self.frames_por_bloque or bloque["criaturas"] != len(pos):
+            self._guardar_bloque()
+            self._abrir_bloque(frame, len(pos), recursos_pos, recursos_disponible)
+            bloque = self._bloque
+        else:
+            self._registrar_eventos(frame, recursos_pos, recursos_disponible)
+        fila = bloque["frames"]
+        self._arrays["criaturas_pos"][fila] = pos
+        self._arrays["criaturas_vel"][fila] = vel
+        self._arrays["criaturas_estado"][fila] = estado
+        bloque["frames"] = fila + 1
+        self._recursos_pos = recursos_pos
+        self._recursos_disponible = recursos_disponible
+
+    def _recortar(self, frame):
+        # Frames ya grabados en el directorio que se vuelven a grabar ahora: los bloques que
+        # empiezan en `frame` o después se reemplazan y el que lo contiene se acorta
+        bloques = [b for b in self.indice["bloques"] if b["primer_frame"] < frame]
+        for bloque in bloques:
+            bloque["frames"] = min(bloque["frames"], frame - bloque["primer_frame"])
+        self.indice["bloques"] = bloques
+
+    def _registrar_eventos(self, frame, recursos_pos, recursos_disponible):
+        anteriores = len(self._recursos_pos)
+        cambiados = np.flatnonzero((recursos_pos[:anteriores] != self._recursos_pos).any(axis=1)
+                                   | (recursos_disponible[:anteriores] != self._recursos_disponible))
+        lugares = np.concatenate([cambiados, np.arange(anteriores, len(recursos_pos))])
+        if lugares.size:
+            eventos = np.empty(lugares.size, dtype=EVENTO)
+            eventos["frame"] = frame
+            eventos["lugar"] = lugares
+            eventos["x"] = recursos_pos[lugares, 0]
+            eventos["y"] = recursos_pos[lugares, 1]
+            eventos["disponible"] = recursos_disponible[lugares]
+            self._eventos.append(eventos)
+
+    def _guardar_bloque(self):
+        if self._bloque is None:
+            return
+        numero = self._bloque["numero"]
+        for array in self._arrays.values():
+            array.flush()
+        eventos = np.concatenate(self._eventos) if self._eventos else np.empty(0, dtype=EVENTO)
+        np.save(self._ruta(numero, "eventos"), eventos)
+        self._escribir_indice()
+
+    def _escribir_indice(self):
+        temporal = os.path.join(self.directorio, "indice.json.tmp")
+        with open(temporal, "w") as archivo:
+            json.dump(self.indice, archivo, indent=1)
+        os.replace(temporal, os.path.join(self.directorio, "indice.json"))
+
+    def volcar(self):
+        # Deja en disco también el bloque en curso (se puede seguir grabando después)
+        self._guardar_bloque()
+
+
+class LectorTrayectorias:
+    # Acceso aleatorio a los frames grabados; los bloques se abren como memmap
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, "indice.json")) as archivo:
+            indice = json.load(archivo)
+        self.parametros = resolver_parametros(ast.literal_eval(indice["parametros"]))
+        self.bloques = [b for b in indice["bloques"] if b["frames"]]
+        self.peligros_pos = np.load(os.path.join(directorio, "peligros_pos.npy"))
+        self._inicios = np.array([b["primer_frame"] for b in self.bloques])
+        self._abiertos = {}
+
+    @property
+    def primer_frame(self):
+        return self.bloques[0]["primer_frame"] if self.bloques else 0
+
+    @property
+    def ultimo_frame(self):
+        ultimo = self.bloques[-1] if self.bloques else None
+        return ultimo["primer_frame"] + ultimo["frames"] - 1 if ultimo else -1
+
+    def __len__(self):
+        return sum(b["frames"] for b in self.bloques)
+
+    def _bloque(self, numero):
+        if numero not in self._abiertos:
+            if len(self._abiertos) >= 4: # Pocos bloques abiertos a la vez
+                self._abiertos.pop(next(iter(self._abiertos)))
+            ruta = lambda nombre: os.path.join(self.directorio, f"bloque_{numero:06d}_{nombre}.npy")
+            self._abiertos[numero] = {nombre: np.load(ruta(nombre), mmap_mode="r")
+                                      for nombre in ("criaturas_pos", "criaturas_vel", "criaturas_estado",
+                                                     "recursos_pos", "recursos_disponible", "eventos")}
+        return self._abiertos[numero]
+
+    def frame(self, frame):
+        # Estado al terminar `frame`: arrays de criaturas y recursos disponibles
+        if not self.primer_frame <= frame <= self.ultimo_frame:
+            raise IndexError(f"Frame {frame} fuera de lo grabado ({self.primer_frame}-{self.ultimo_frame})")
+        indice = int(np.searchsorted(self._inicios, frame, side="right")) - 1
+        bloque = self.bloques[indice]
+        datos = self._bloque(bloque["numero"])
+        fila = frame - bloque["primer_frame"]
+        eventos = datos["eventos"]
+        eventos = eventos[:np.searchsorted(eventos["frame"], frame, side="right")]
+        lugares = eventos["lugar"]
+        total = max(len(datos["recursos_pos"]), int(lugares.max()) + 1 if lugares.size else 0)
+        recursos_pos = np.zeros((total, 2), dtype=np.float32)
+        recursos_disponible = np.zeros(total, dtype=bool)
+        recursos_pos[:len(datos["recursos_pos"])] = datos["recursos_pos"]
+        recursos_disponible[:len(datos["recursos_disponible"])] = datos["recursos_disponible"]
+        # Los eventos están en orden de frame: el último de cada lugar es el que vale
+        recursos_pos[lugares, 0] = eventos["x"]
+        recursos_pos[lugares, 1] = eventos["y"]
+        recursos_disponible[lugares] = eventos["disponible"]
+        return {
+            "frame": frame,
+            "criaturas_pos": np.asarray(datos["criaturas_pos"][fila]),
+            "criaturas_vel": np.asarray(datos["criaturas_vel"][fila]),
+            "criaturas_estado": np.asarray(datos["criaturas_estado"][fila]),
+            "recursos_pos": recursos_pos[recursos_disponible],
+            "peligros_pos": self.peligros_pos,
+        }
+
+    def capas(self, datos, camara=None):
+        # Mismo formato que Simulacion.capas(), para dibujar con dibujo.py; con una
+        # camara.Camara, sólo lo que se ve. A propósito con una máscara y no con un índice:
+        # cada frame se lee entero del disco, así que la máscara es una pasada más sobre un
+        # array ya leído y armar un índice por frame costaría más que ella.
+        p = self.parametros
+        if camara is not None:
+            radios = (p["RADIO_RECURSO"], p["RADIO_PELIGRO_VISUAL"], p["RADIO_CRIATURA"])
+            capas = []
+            for color, radio, posiciones in zip((p["COLOR_RECURSO_RGB"], p["COLOR_PELIGRO_RGB"], p["COLOR_CRIATURA_RGB"]), radios,
+                                                (datos["recursos_pos"], datos["peligros_pos"], datos["criaturas_pos"])):
+                visibles = posiciones[camara.en_vista(posiciones, margen=max(radios))]
+                radio = camara.radio(radio)
+                capas.append((color, radio, (camara.a_pantalla(visibles) - radio).tolist()))
+            return capas
+        def esquinas(posiciones, radio):
+            return (posiciones.astype(int) - radio).tolist()
+        return [(p["COLOR_RECURSO_RGB"], p["RADIO_RECURSO"], esquinas(datos["recursos_pos"], p["RADIO_RECURSO"])),
+                (p["COLOR_PELIGRO_RGB"], p["RADIO_PELIGRO_VISUAL"], esquinas(datos["peligros_pos"], p["RADIO_PELIGRO_VISUAL"])),
+                (p["COLOR_CRIATURA_RGB"], p["RADIO_CRIATURA"], esquinas(datos["criaturas_pos"], p["RADIO_CRIATURA"]))]
+
+
+# --- Visor ---
+def reproducir(directorio, fps=30):
+    # Espacio: pausa. Flechas izquierda/derecha: un frame (con pausa); arriba/abajo: 100;
+    # RePág/AvPág: 1000; Inicio/Fin; +/-: velocidad. Clic en la barra de abajo: ir a ese punto.
+    # Rueda del mouse: zoom; arrastrar: mover la cámara (el mundo puede ser más grande que la ventana).
+    import pygame
+    from camara import Camara
+    from dibujo import Renderizador
+
+    lector = LectorTrayectorias(directorio)
+    if not len(lector):
+        print(f"No hay frames grabados en {directorio}")
+        return
+    p = lector.parametros
+    ancho, alto = min(p["ANCHO_VENTANA"], p["ANCHO_PANTALLA"]), min(p["ALTO_VENTANA"], p["ALTO_PANTALLA"])
+    camara = Camara(ancho, alto, p["ANCHO_PANTALLA"], p["ALTO_PANTALLA"])
+    pygame.init()
+    pantalla = pygame.display.set_mode((ancho, alto))
+    pygame.display.set_caption(f"Reproducción: {directorio}")
+    reloj = pygame.time.Clock()
+    fuente = pygame.font.Font(None, 24)
+    renderizador = Renderizador(GRIS_CLARO)
+    barra = pygame.Rect(10, alto - 16, ancho - 20, 8)
+
+    frame, velocidad, pausa = lector.primer_frame, 1, False
+    saltos = {pygame.K_RIGHT: 1, pygame.K_LEFT: -1, pygame.K_UP: 100, pygame.K_DOWN: -100,
+              pygame.K_PAGEUP: 1000, pygame.K_PAGEDOWN: -1000}
+    ejecutando = True
+    while ejecutando:
+        for evento in pygame.event.get():
+            if evento.type == pygame.QUIT:
+                ejecutando = False
+            elif evento.type == pygame.KEYDOWN:
+                if evento.key in (pygame.K_ESCAPE, pygame.K_q):
+                    ejecutando = False
+                elif evento.key == pygame.K_SPACE:
+                    pausa = not pausa
+                elif evento.key in saltos:
+                    frame += saltos[evento.key]
+                    pausa = pausa or abs(saltos[evento.key]) == 1
+                elif evento.key == pygame.K_HOME:
+                    frame = lector.primer_frame
+                elif evento.key == pygame.K_END:
+                    frame = lector.ultimo_frame
+                elif evento.key in (pygame.K_PLUS, pygame.K_KP_PLUS, pygame.K_EQUALS):
+                    velocidad = min(velocidad * 2, 1024)
+                elif evento.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    velocidad = max(velocidad // 2, 1)
+            elif evento.type == pygame.MOUSEBUTTONDOWN and barra.inflate(0, 12).collidepoint(evento.pos):
+                fraccion = (evento.pos[0] - barra.x) / barra.width
+                frame = lector.primer_frame + round(fraccion * (lector.ultimo_frame - lector.primer_frame))
+            elif evento.type == pygame.MOUSEWHEEL:
+                camara.acercar(1.25 ** evento.y, pygame.mouse.get_pos())
+            elif evento.type == pygame.MOUSEMOTION and evento.buttons[0] and not barra.inflate(0, 12).collidepoint(evento.pos):
+                camara.mover(-evento.rel[0], -evento.rel[1])
+        frame = min(max(frame, lector.primer_frame), lector.ultimo_frame)
+
+        datos = lector.frame(frame)
+        estados = np.bincount(datos["criaturas_estado"], minlength=len(ESTADOS))
+        texto = (f"Frame {frame}/{lector.ultimo_frame}  x{velocidad}{'  (pausa)' if pausa else ''}  "
+                 f"Buscando: {estados[ESTADO_BUSCANDO]}  Evadiendo: {estados[ESTADO_EVADIENDO]}  "
+                 f"Explorando: {estados[ESTADO_EXPLORANDO]}")
+        textos = [(renderizador.texto(fuente, texto, NEGRO), (10, 10))]
+        renderizador.dibujar(pantalla, lector.capas(datos, camara), textos)
+        progreso = (frame - lector.primer_frame) / max(1, lector.ultimo_frame - lector.primer_frame)
+        pygame.draw.rect(pantalla, NEGRO, barra, 1)
+        pygame.draw.rect(pantalla, NEGRO, (barra.x, barra.y, round(barra.width * progreso), barra.height))
+        renderizador.invalidar() # La barra no pasa por el renderizador: se envía la pantalla entera
+        pygame.display.flip()
+        reloj.tick(fps)
+        if not pausa:
+            if frame == lector.ultimo_frame:
+                pausa = True
+            frame += velocidad
+    pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visor de trayectorias grabadas con DIRECTORIO_TRAYECTORIA.")
+    parser.add_argument("directorio")
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args(argv)
+    reproducir(args.directorio, args.fps)
+
+
+if __name__ == "__main__":
+    main()